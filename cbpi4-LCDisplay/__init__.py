@@ -1,12 +1,30 @@
 # -*- coding: utf-8 -*-
+import os
+import re
+import json
 import time
 import socket
 import fcntl
 import struct
 import logging
 import asyncio
-from RPLCD.i2c import CharLCD
+import threading
+import unicodedata
+from array import array
+try:
+    from RPLCD.i2c import CharLCD
+    from RPLCD.codecs import hd44780_a00, hd44780_a02
+except ImportError:
+    # only the Virtual and None display backends work without RPLCD
+    CharLCD = None
+    hd44780_a00 = hd44780_a02 = None
+try:
+    import RPi.GPIO as GPIO
+except (ImportError, RuntimeError):
+    # only needed for the wake up button, see LCD_Wake_GPIO
+    GPIO = None
 from time import strftime
+from aiohttp import web
 from cbpi.api import *
 from cbpi.api.config import ConfigType
 # from cbpi.api.dataclasses import NotificationAction, NotificationType
@@ -41,6 +59,32 @@ from cbpi.api.config import ConfigType
 # and change
 # set_lcd_sensortype_for_sensor_mode1 into set_lcd_sensortype_for_sensor_mode.
 # 20.09.2021 removed RPLCD source files. Instead the package has to be installed. This is done by
+# 17.10.2026 screens render into a frame buffer, only the changed cells are sent to the LCD
+# 17.10.2026 LCD writes moved to a writer thread, the event loop only hands over frames
+# 17.10.2026 added LCD_Update_Mode Event: single mode repaints only when a displayed value changes
+# 17.10.2026 all LCD parameters are read once into LCDSettings and only refreshed every few seconds.
+# Instead of renaming the set_lcd_sensortype_for_sensor_mode functions set SENSORTYPE_SELECT = True now.
+# 17.10.2026 kettles, sensors, actors and steps are looked up by id in StateIndex, one get_state() per frame
+# 17.10.2026 sensormode shows one sensor per loop and always sleeps, no more blocking if no sensor matches
+# 17.10.2026 sensormode can show 3 or 4 sensors at once, see LCD_Sensors_Per_Page
+# 17.10.2026 IP address of any interface is cached for a minute, no more socket per second in standby
+# 17.10.2026 cbidecode uses a translate table per charactermap, see CHARMAP_TRANSLATIONS
+# 17.10.2026 custom symbols are loaded into CGRAM only when shown, see register_glyph for adding new ones
+# 17.10.2026 added LCD_Backend: PCF8574, MCP23008, MCP23017 and Virtual/None for testing without LCD
+# 17.10.2026 added tools/benchmark.py, measures the display modes with a simulated CBPi and the Virtual backend
+# 17.10.2026 added LCD_Metrics, timing counters at http://<cbpi>:8000/lcdisplay/metrics and LCDisplay Metric sensor
+# 17.10.2026 LCD is initialised again after I2C errors with increasing delays, also if it was missing at start
+# 17.10.2026 up to 4 LCDs with own address, bus, mode, kettle and refresh, see LCD_Number_Of_Displays
+# 17.10.2026 screens are templates compiled per LCD geometry (16x2 ... 40x4), see SCREENS and LCD_Geometry
+# 17.10.2026 any number of Hop_n props, Add Hop screen at the second of the addition, see LCD_Hop_Alert
+# 17.10.2026 Multidisplay updates timers, temperature and heater every second, see LCD_Live_Values
+# 17.10.2026 sensor values are read in parallel with a deadline, a late sensor is shown with an hourglass
+# 17.10.2026 last known sensor values in a ring buffer, trend arrow behind the kettle temperature
+# 17.10.2026 Multidisplay shows busy kettles more often, see LCD_Multidisplay_Order
+# 17.10.2026 Overview mode, one row per kettle
+# 17.10.2026 backlight off after LCD_Idle_Time without brewing activity, wake up button on LCD_Wake_GPIO
+# 17.10.2026 Fermenterdisplay mode with day of the step and min/max/avg of the last 24 h, also instead of standby
+# 17.10.2026 the last frame is shown again at once after a restart, see LCD_Warm_Start and WarmStart
 #
 # pipy related installation of plugin:
 # goto folder where CBPI4 is installed (at least the folder which is containing the config folder)
@@ -50,7 +94,13 @@ from cbpi.api.config import ConfigType
 logger = logging.getLogger(__name__)
 DEBUG = False  # turn True to show (much) more debug info in app.log
 BLINK = False  # start value for blinking the beerglass during heating only for single mode
-global lcd
+# ws topics which are pushed by CBPi controllers whenever kettles, actors, steps or fermenters change
+WAKE_TOPICS = ('kettleupdate', 'actorupdate', 'step_update', 'mash_profile_update', 'fermenterupdate',
+               'fermenterstepupdate')
+# bus topics (fired from websocket clients or mqtt satellites) which wake up the display in Event mode
+WAKE_EVENT_PREFIXES = ('step', 'kettle', 'sensor', 'actor', 'config', 'fermenter')
+# True if you are not using avollkopfs cbpi4-ui: LCD_Display_Sensortype is a list of sensor types instead of a sensor
+SENSORTYPE_SELECT = False
 # beerglass symbol
 bierkrug = (
     0b11100,
@@ -117,331 +167,2724 @@ esszett = (
     0b11100,
     0b10000
 )
+# flame symbol for a heater
+flame = (
+    0b00100,
+    0b00100,
+    0b01010,
+    0b01010,
+    0b10101,
+    0b10001,
+    0b01110,
+    0b00000
+)
+# pump symbol, a wheel in a circle
+pump = (
+    0b00000,
+    0b01110,
+    0b10101,
+    0b11111,
+    0b10101,
+    0b01110,
+    0b00000,
+    0b00000
+)
+arrowup = (
+    0b00100,
+    0b01110,
+    0b10101,
+    0b00100,
+    0b00100,
+    0b00100,
+    0b00100,
+    0b00000
+)
+arrowdown = (
+    0b00100,
+    0b00100,
+    0b00100,
+    0b00100,
+    0b10101,
+    0b01110,
+    0b00100,
+    0b00000
+)
+# hourglass, shown behind a sensor value which is not up to date
+hourglass = (
+    0b11111,
+    0b10001,
+    0b01010,
+    0b00100,
+    0b01010,
+    0b10001,
+    0b11111,
+    0b00000
+)
+
+# Custom symbols which can be used in a frame. Each one gets a placeholder letter of the unicode private use area.
+# The GlyphAllocator loads a symbol into one of the 8 CGRAM slots of the LCD only when a frame shows it.
+# placeholder letter -> (name, bitmap, substitute if more than 8 different symbols are in one frame)
+GLYPHS = {}
+
+
+def register_glyph(name, bitmap, substitute):
+    char = chr(0xE000 + len(GLYPHS))
+    GLYPHS[char] = (name, bitmap, substitute)
+    return char
+
+
+BEERGLASS = register_glyph('bierkrug', bierkrug, '*')
+SNOWFLAKE = register_glyph('cool', cool, '*')
+A_UMLAUT = register_glyph('awithdots', awithdots, 'A')
+O_UMLAUT = register_glyph('owithdots', owithdots, 'O')
+U_UMLAUT = register_glyph('uwithdots', uwithdots, 'U')
+SHARP_S = register_glyph('esszett', esszett, 's')
+FLAME = register_glyph('flame', flame, 'H')
+PUMP = register_glyph('pump', pump, 'P')
+ARROW_UP = register_glyph('arrowup', arrowup, '^')
+ARROW_DOWN = register_glyph('arrowdown', arrowdown, 'v')
+STALE = register_glyph('hourglass', hourglass, '?')
+
+# letters the ROM of the charactermap can not show, replaced by a custom symbol or a letter which exists in the ROM.
+# Add your own charactermap or letters here.
+CHARMAP_TRANSLATIONS = {
+    'A00': {'Ä': A_UMLAUT, 'Ö': O_UMLAUT, 'Ü': U_UMLAUT, 'ß': SHARP_S},
+    'A02': {'°': 'ᴼ'},  # RPLCD names the degree symbol at 0xB0 of A02 'ᴼ'
+}
+# used for every charactermap if the letter is missing in its ROM
+TRANSLITERATION = {'€': 'EUR', '–': '-', '—': '-', '„': '"', '“': '"', '”': '"', '‚': "'", '‘': "'", '’': "'",
+                   '…': '...', 'ẞ': 'SS', 'Œ': 'OE', 'œ': 'oe', 'Æ': 'AE', 'æ': 'ae', 'Ø': 'O', 'ø': 'o'}
+ROM_TABLES = {'A00': hd44780_a00.encoding_table, 'A02': hd44780_a02.encoding_table} if CharLCD is not None else {}
+
+
+class GlyphAllocator:
+    # Keeps track of the 8 CGRAM slots of the HD44780. map() replaces the placeholder letters of the custom symbols
+    # in a frame by the slot numbers \x00-\x07 and tells which symbols have to be uploaded first. A symbol which is
+    # already in a slot is never uploaded again, if no slot is free the least recently used symbol which is not part
+    # of the frame is replaced. More than 8 different symbols in one frame get their substitute letter.
+    SLOTS = 8
+
+    def __init__(self):
+        self.slots = [None] * self.SLOTS
+        self.last_used = [0] * self.SLOTS
+        self.pending = []  # uploads of restore(), sent with the next frame
+        self.tick = 0
+        self.uploads = 0
+        self.substitutions = 0
+
+    def reset(self):
+        # the LCD was initialised again, CGRAM content is unknown
+        self.slots = [None] * self.SLOTS
+        self.last_used = [0] * self.SLOTS
+        self.pending = []
+
+    def names(self):
+        # the slot table by glyph name, saved by WarmStart
+        return [GLYPHS[char][0] if char in GLYPHS else None for char in self.slots]
+
+    def restore(self, names):
+        # the slot table of the last run: these symbols are uploaded with the next frame, so the following frames
+        # find them in CGRAM like before the restart
+        chars = {GLYPHS[char][0]: char for char in GLYPHS}
+        self.reset()
+        for slot, name in enumerate(names[:self.SLOTS]):
+            if name in chars:
+                self.slots[slot] = chars[name]
+                self.pending.append((slot, GLYPHS[chars[name]][1]))
+                self.uploads += 1
+        pass
+
+    def map(self, lines):
+        needed = []
+        for line in lines:
+            for char in line:
+                if char in GLYPHS and char not in needed:
+                    needed.append(char)
+        uploads, self.pending = self.pending, []
+        if not needed:
+            return lines, uploads
+        self.tick += 1
+        mapping = {}
+        for char in needed[self.SLOTS:]:
+            mapping[char] = GLYPHS[char][2]
+            self.substitutions += 1
+        needed = needed[:self.SLOTS]
+        for char in needed:
+            if char in self.slots:
+                slot = self.slots.index(char)
+            else:
+                free = [i for i in range(self.SLOTS) if self.slots[i] not in needed]
+                slot = min(free, key=lambda i: (self.slots[i] is not None, self.last_used[i]))
+                self.slots[slot] = char
+                uploads.append((slot, GLYPHS[char][1]))
+                self.uploads += 1
+            self.last_used[slot] = self.tick
+            mapping[char] = chr(slot)
+        table = str.maketrans(mapping)
+        return [line.translate(table) for line in lines], uploads
+
+
+class FrameBuffer:
+    # Shadow copy of the LCD cells. The screens render their lines into self.lines, flush() compares them with
+    # self.shown (what is on the glass right now) and only sends the runs of cells that changed.
+    # Every character and every cursor move is one byte over the slow PCF8574 expander, therefore two dirty runs
+    # which are only separated by MERGE_GAP unchanged cells are written as one run instead of moving the cursor.
+    MERGE_GAP = 1
+
+    def __init__(self, rows=4, cols=20):
+        self.rows = rows
+        self.cols = cols
+        self.lines = [" " * cols] * rows
+        self.shown = [None] * rows  # None means unknown content, the row is written completely on next flush
+
+    def set_line(self, row, text):
+        self.lines[row] = text.ljust(self.cols)[:self.cols]
+
+    def set_lines(self, lines):
+        # lines rendered by a Layout, they have the right length already
+        self.lines[:len(lines)] = lines
+
+    def put(self, row, col, text):
+        line = self.lines[row]
+        self.lines[row] = (line[:col] + text + line[col + len(text):])[:self.cols]
+
+    def invalidate(self):
+        # forces a full repaint e.g. after the display was cleared or a write failed
+        self.shown = [None] * self.rows
+
+    def dirty_runs(self):
+        runs = []
+        for row in range(self.rows):
+            line = self.lines[row]
+            shown = self.shown[row]
+            if line == shown:
+                continue
+            if shown is None:
+                runs.append((row, 0, line))
+                continue
+            start = None
+            end = None
+            for col in range(self.cols):
+                if line[col] != shown[col]:
+                    if start is None:
+                        start = col
+                    elif col - end > self.MERGE_GAP + 1:
+                        runs.append((row, start, line[start:end + 1]))
+                        start = col
+                    end = col
+            runs.append((row, start, line[start:end + 1]))
+        return runs
+
+    def flush(self, display):
+        runs = self.dirty_runs()
+        try:
+            for row, col, text in runs:
+                display.write(row, col, text)
+        except Exception:
+            self.invalidate()
+            raise
+        self.shown = list(self.lines)
+        return runs
+
+
+class DisplayWorker(threading.Thread):
+    # Owns the LCD after it is initialised. Every I2C transaction blocks, so the coroutines only hand over the
+    # rendered lines with submit() and return at once. There is a single pending slot: when a new frame arrives
+    # before the previous one was written, the previous one is dropped (latest frame wins).
+    # The worker also supervises the connection: a failed write (e.g. relay noise on the I2C bus) closes the
+    # backend and it is opened again after RETRY_MIN, 2 * RETRY_MIN ... up to RETRY_MAX seconds. After a successful
+    # open the custom symbols are uploaded again and the whole frame is repainted. One warning per outage and one
+    # info after the recovery, nothing in between unless DEBUG is True.
+    STATS_LOG_INTERVAL = 300  # frames between two stats lines in app.log when DEBUG is True
+    RETRY_MIN = 0.5  # sec
+    RETRY_MAX = 60.0  # sec
+    REPAINT_INTERVAL = 60  # sec, full repaint incl. custom symbols, repairs cells garbled by bus noise
+    REINIT_INTERVAL = 900  # sec, initialise the controller again in case it lost the 4 bit sync, 0 = never
+
+    def __init__(self, display, rows=4, cols=20, connected=True):
+        super().__init__(name="LCDisplay-writer", daemon=True)
+        self.display = display
+        self.frame = FrameBuffer(rows=rows, cols=cols)  # what is on the glass, only touched by this thread
+        self.glyphs = GlyphAllocator()
+        self._cond = threading.Condition()
+        self._pending = None
+        self._backlight = None  # backlight state still to be sent, None if nothing to do
+        self.backlight = True  # backlight state requested by the plugin, set again after every open()
+        self._stopped = False
+        self.last_lines = None
+        self.connected = connected
+        self.in_outage = not connected  # the warning of a failed start was already logged by the plugin
+        self.outage_tries = 0
+        self.retry_delay = self.RETRY_MIN
+        self.retry_at = time.monotonic() + self.RETRY_MIN
+        self.opened_at = time.monotonic()
+        self.repainted_at = time.monotonic()
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.write_errors = 0
+        self.write_retries = 0
+        self.reconnects = 0
+        self.last_write_latency = 0.0
+        self.max_write_latency = 0.0
+        self.total_write_latency = 0.0
+        self.last_queue_delay = 0.0
+
+    def submit(self, lines):
+        with self._cond:
+            if self._pending is not None:
+                self.frames_dropped += 1
+            self._pending = (tuple(lines), time.monotonic())
+            self.frames_submitted += 1
+            self._cond.notify()
+
+    def set_backlight(self, enabled):
+        with self._cond:
+            self.backlight = enabled
+            self._backlight = enabled
+            self._cond.notify()
+
+    def queue_depth(self):
+        return 0 if self._pending is None else 1
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def stats(self):
+        written = self.frames_written
+        return {'queue_depth': self.queue_depth(),
+                'connected': self.connected,
+                'frames_submitted': self.frames_submitted,
+                'frames_written': written,
+                'frames_dropped': self.frames_dropped,
+                'write_errors': self.write_errors,
+                'write_retries': self.write_retries,
+                'reconnects': self.reconnects,
+                'glyph_uploads': self.glyphs.uploads,
+                'glyph_substitutions': self.glyphs.substitutions,
+                'last_write_ms': round(self.last_write_latency * 1000, 2),
+                'avg_write_ms': round(self.total_write_latency * 1000 / written, 2) if written else 0.0,
+                'max_write_ms': round(self.max_write_latency * 1000, 2),
+                'last_queue_delay_ms': round(self.last_queue_delay * 1000, 2)}
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self.connected:
+                        timeout = self.retry_at - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        self._cond.wait(timeout)
+                    elif self._pending is not None or self._backlight is not None:
+                        break
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+                pending = None
+                backlight = None
+                if self.connected:
+                    pending = self._pending
+                    backlight = self._backlight
+                    self._pending = None
+                    self._backlight = None
+            if not self.connected:
+                self.reconnect()
+                continue
+            if backlight is not None:
+                try:
+                    self.display.set_backlight(backlight)
+                except Exception as e:
+                    self.write_errors += 1
+                    self.disconnect(e)
+                    continue
+                pass
+            if pending is None:
+                continue
+            lines, submitted = pending
+            start = time.monotonic()
+            self.maintain(start)
+            if not self.connected:
+                # the re-init failed, the frame is written after the reconnect
+                self.last_lines = lines
+                continue
+            if not self.write_frame(lines):
+                continue
+            end = time.monotonic()
+            self.last_queue_delay = start - submitted
+            self.last_write_latency = end - start
+            self.total_write_latency += self.last_write_latency
+            self.max_write_latency = max(self.max_write_latency, self.last_write_latency)
+            self.frames_written += 1
+            if DEBUG and self.frames_written % self.STATS_LOG_INTERVAL == 0:
+                logger.info('LCDisplay - writer stats: %s' % self.stats())
+
+    def write_frame(self, lines):
+        # blocking, called by run() for every frame. The benchmark calls it directly instead of starting the thread.
+        self.last_lines = lines
+        try:
+            lines, uploads = self.glyphs.map(lines)
+            for slot, bitmap in uploads:
+                self.display.create_char(slot, bitmap)
+            self.frame.lines = list(lines)
+            self.frame.flush(self.display)
+        except Exception as e:
+            self.glyphs.reset()
+            self.frame.invalidate()
+            self.write_errors += 1
+            self.disconnect(e)
+            return False
+        if self.in_outage:
+            self.in_outage = False
+            self.retry_delay = self.RETRY_MIN
+            logger.info('LCDisplay - LCD initialised again after %s tries' % self.outage_tries)
+        return True
+
+    def maintain(self, now):
+        # nothing tells if the LCD shows garbage, so repaint and initialise it from time to time
+        if self.REINIT_INTERVAL and now - self.opened_at > self.REINIT_INTERVAL:
+            try:
+                self.display.close()
+                self.open_display()
+            except Exception as e:
+                self.disconnect(e)
+                return
+            self.opened_at = now
+            self.repaint(now)
+        elif now - self.repainted_at > self.REPAINT_INTERVAL:
+            self.repaint(now)
+        pass
+
+    def repaint(self, now):
+        self.glyphs.reset()
+        self.frame.invalidate()
+        self.repainted_at = now
+
+    def open_display(self):
+        # a new CharLCD starts with the backlight on, an idle LCD has to stay dark
+        self.display.open()
+        if not self.backlight:
+            self.display.set_backlight(False)
+
+    def disconnect(self, error):
+        # the outage only ends with a successful write, an LCD which opens but fails to write keeps backing off
+        self.connected = False
+        if not self.in_outage:
+            self.retry_delay = self.RETRY_MIN
+        else:
+            self.retry_delay = min(self.retry_delay * 2, self.RETRY_MAX)
+        self.retry_at = time.monotonic() + self.retry_delay
+        if not self.in_outage:
+            self.in_outage = True
+            self.outage_tries = 0
+            logger.warning('LCDisplay - LCD write failed, trying to initialise it again: {}'.format(error))
+        elif DEBUG:
+            logger.info('LCDisplay - LCD write failed: {}'.format(error))
+
+    def reconnect(self):
+        self.write_retries += 1
+        self.outage_tries += 1
+        try:
+            self.display.close()
+        except Exception as e:
+            if DEBUG: logger.info('LCDisplay - closing LCD failed: {}'.format(e))
+        try:
+            self.open_display()
+        except Exception as e:
+            self.retry_delay = min(self.retry_delay * 2, self.RETRY_MAX)
+            self.retry_at = time.monotonic() + self.retry_delay
+            if DEBUG: logger.info('LCDisplay - LCD init failed, next try in %.1fs: %s' % (self.retry_delay, e))
+            return
+        now = time.monotonic()
+        self.connected = True
+        self.reconnects += 1
+        self.opened_at = now
+        self.repaint(now)
+        if DEBUG: logger.info('LCDisplay - LCD opened again after %s tries' % self.outage_tries)
+        with self._cond:
+            # repaint what should be shown, also if no new frame arrives for a while (Event mode)
+            if self._pending is None and self.last_lines is not None:
+                self._pending = (self.last_lines, now)
+        pass
+
+
+class LCDBackend:
+    # Interface between the DisplayWorker and the hardware. All methods block and are only called from the writer
+    # thread (open() from an executor thread before the writer starts).
+    name = 'None'
+
+    def __init__(self, rows=4, cols=20):
+        self.rows = rows
+        self.cols = cols
+
+    def open(self):
+        pass
+
+    def write(self, row, col, text):
+        pass
+
+    def create_char(self, slot, bitmap):
+        pass
+
+    def set_backlight(self, enabled):
+        pass
+
+    def clear(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullBackend(LCDBackend):
+    # used when no display is configured, frames are simply dropped
+    name = 'None'
+
+
+class RPLCDBackend(LCDBackend):
+    # HD44780 behind an I2C port expander, driven by RPLCD. PCF8574 is the usual backpack, MCP23008 and MCP23017
+    # are used by the Adafruit and some other backpacks.
+    MAX_CELLS = 80  # one HD44780 controller, the second one of a 40x4 LCD is not supported by RPLCD
+
+    def __init__(self, expander='PCF8574', address=0x27, port=1, charmap='A00', rows=4, cols=20,
+                 expander_params=None):
+        super().__init__(rows=rows, cols=cols)
+        self.name = expander
+        self.expander = expander
+        self.address = address
+        self.port = port
+        self.charmap = charmap
+        self.expander_params = expander_params
+        self.lcd = None
+
+    def open(self):
+        if CharLCD is None:
+            raise RuntimeError('RPLCD is not installed, sudo pip3 install RPLCD')
+        self.lcd = CharLCD(i2c_expander=self.expander, address=self.address, expander_params=self.expander_params,
+                           port=self.port, cols=self.cols, rows=self.rows, dotsize=8, charmap=self.charmap,
+                           auto_linebreaks=True, backlight_enabled=True)
+        # custom symbols are uploaded by the GlyphAllocator of the DisplayWorker when a frame needs them
+        self.lcd._set_cursor_mode('hide')
+
+    def write(self, row, col, text):
+        self.lcd.cursor_pos = (row, col)
+        self.lcd.write_string(text)
+
+    def create_char(self, slot, bitmap):
+        self.lcd.create_char(slot, bitmap)
+
+    def set_backlight(self, enabled):
+        self.lcd.backlight_enabled = enabled
+
+    def clear(self):
+        self.lcd.clear()
+
+    def close(self):
+        if self.lcd is not None:
+            lcd, self.lcd = self.lcd, None
+            lcd.close(clear=False)
+
+
+class VirtualLCD(LCDBackend):
+    # In memory LCD for benchmarks and tests on any Linux box. It keeps the cells and the CGRAM and counts what a
+    # PCF8574 backpack would have to send: every command or character is one LCD byte, which takes
+    # I2C_BYTES_PER_LCD_BYTE bytes on the bus in 4 bit mode (2 nibbles, each written with and without enable).
+    name = 'Virtual'
+    I2C_BYTES_PER_LCD_BYTE = 6
+
+    def __init__(self, rows=4, cols=20):
+        super().__init__(rows=rows, cols=cols)
+        self.cells = [[' '] * cols for row in range(rows)]
+        self.cgram = {}
+        self.backlight = True
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.writes = 0
+        self.commands = 0
+        self.characters = 0
+        self.glyph_uploads = 0
+
+    @property
+    def lcd_bytes(self):
+        return self.commands + self.characters
+
+    @property
+    def i2c_bytes(self):
+        return self.lcd_bytes * self.I2C_BYTES_PER_LCD_BYTE
+
+    def write(self, row, col, text):
+        self.writes += 1
+        self.commands += 1  # set cursor position
+        for char in text[:self.cols - col]:
+            self.cells[row][col] = char
+            col += 1
+        self.characters += len(text)
+
+    def create_char(self, slot, bitmap):
+        self.cgram[slot] = tuple(bitmap)
+        self.glyph_uploads += 1
+        self.commands += 2  # set CGRAM address, restore cursor position
+        self.characters += len(bitmap)
+
+    def set_backlight(self, enabled):
+        self.backlight = enabled
+        self.commands += 1
+
+    def clear(self):
+        self.cells = [[' '] * self.cols for row in range(self.rows)]
+        self.commands += 1
+
+    def text(self):
+        return [''.join(row) for row in self.cells]
+
+    def stats(self):
+        return {'writes': self.writes,
+                'lcd_bytes': self.lcd_bytes,
+                'i2c_bytes': self.i2c_bytes,
+                'glyph_uploads': self.glyph_uploads}
+
+
+BACKENDS = ('PCF8574', 'MCP23008', 'MCP23017', 'Virtual', 'None')
+
+
+def make_backend(name, address, charmap, port=1, rows=4, cols=20):
+    if name == 'Virtual':
+        return VirtualLCD(rows=rows, cols=cols)
+    if name == 'None':
+        return NullBackend(rows=rows, cols=cols)
+    expander_params = {'gpio_bank': 'A'} if name == 'MCP23017' else None
+    return RPLCDBackend(expander=name, address=address, port=port, charmap=charmap, rows=rows, cols=cols,
+                        expander_params=expander_params)
+
+
+class Layout:
+    # A screen template compiled for one geometry. A template has one string per row with literal text and fields:
+    # {name} gets the columns which are left over, {name:8} is 8 columns left aligned, {name:>8} right aligned and
+    # {name:>6|.2f} formats a number with .2f before. Every row is compiled into one format string, so rendering a
+    # frame is one str.format() per row which pads and cuts all fields at once. A row starting with ? stays empty
+    # when all its fields are empty. Rows which the template does not have are empty.
+    FIELD = re.compile(r'\{(\w+)(?::([<>^]?)(\d*)(?:\|([^}]*))?)?\}')
+
+    def __init__(self, template, rows=4, cols=20):
+        self.rows = rows
+        self.cols = cols
+        self.blank = ' ' * cols
+        self.widths = {}  # field -> columns in the first row which has it
+        self.plan = [self.compile_row(text) for text in template[:rows]]
+        self.plan += [None] * (rows - len(self.plan))
+
+    def compile_row(self, text):
+        optional = text.startswith('?')
+        if optional:
+            text = text[1:]
+        parts = []  # literal text or (name, align, width, number format)
+        pos = 0
+        for match in self.FIELD.finditer(text):
+            if match.start() > pos:
+                parts.append(text[pos:match.start()])
+            name, align, width, number_format = match.groups()
+            parts.append((name, align or '<', int(width) if width else None, number_format))
+            pos = match.end()
+        if pos < len(text):
+            parts.append(text[pos:])
+        fixed = sum(len(part) if isinstance(part, str) else part[2] or 0 for part in parts)
+        flexible = [part for part in parts if not isinstance(part, str) and part[2] is None]
+        if len(flexible) > 1:
+            raise ValueError('LCDisplay - only one field without width allowed per row: %s' % text)
+        pattern = ''
+        fields = []
+        for part in parts:
+            if isinstance(part, str):
+                pattern += part.replace('{', '{{').replace('}', '}}')
+                continue
+            name, align, width, number_format = part
+            if width is None:
+                width = max(self.cols - fixed, 0)
+            if width > 0:
+                pattern += '{%d:%s%d.%d}' % (len(fields), align, width, width)
+                fields.append((name, number_format))
+                self.widths.setdefault(name, width)
+            pass
+        if fixed < self.cols and not flexible:
+            pattern += ' ' * (self.cols - fixed)
+        return pattern, tuple(fields), optional, fixed > self.cols
+
+    @staticmethod
+    def convert(value, number_format):
+        if value is None:
+            return ''
+        if number_format and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return format(value, number_format)
+        return str(value)
+
+    def render(self, values):
+        lines = []
+        for row in self.plan:
+            if row is None:
+                lines.append(self.blank)
+                continue
+            pattern, fields, optional, too_long = row
+            args = [self.convert(values.get(name), number_format) for name, number_format in fields]
+            if optional and not any(args):
+                lines.append(self.blank)
+                continue
+            line = pattern.format(*args)
+            lines.append(line[:self.cols] if too_long else line)
+        return lines
+
+
+# screen -> ((min. columns, min. rows), template), the largest template which fits the LCD is used.
+# Add a template here for other geometries, the field names are the ones the show_xxx functions fill in.
+# mark is the degree sign behind the current temperature, or the STALE symbol if the sensor did not answer in time.
+# trend is an arrow if the temperature rises or falls, rate the change per minute like +0.8°/min.
+SCREENS = {
+    'standby': (
+        ((20, 4), ('CBPI       {version}', '{brewery}', 'IP: {ip}', '{date_time}')),
+        ((16, 4), ('CBPI {version}', '{brewery}', 'IP:{ip}', '{date_time}')),
+        ((16, 2), ('{brewery}', '{ip}')),
+    ),
+    'kettle': (
+        ((40, 4), ('{step}{heater:1}', '{kettle}{remaining:>9}', 'Target Temp: {target:>6|.2f}{degree:1}{unit}',
+                   'Current Temp:{actual:>6|.2f}{mark:1}{unit:1} {trend:1}{rate}')),
+        ((20, 4), ('{step}{heater:1}', '{kettle}{remaining:>9}', 'Targ. Temp:{target:>6|.2f}{degree:1}{unit}',
+                   'Curr. Temp:{actual:>6|.2f}{mark:1}{unit}{trend:1}')),
+        ((16, 4), ('{step}{heater:1}', '{kettle}{remaining:>9}', 'Target:{target:>6|.2f}{degree:1}{unit}',
+                   'Actual:{actual:>6|.2f}{mark:1}{unit}{trend:1}')),
+        ((16, 2), ('{kettle}{remaining:>9}{heater:1}',
+                   '{actual:>5|.1f}{mark:1}{trend:1}>{target:>5|.1f}{degree:1}{unit}')),
+    ),
+    'boil': (
+        ((40, 4), ('{step}{heater:1}', '{kettle}{remaining:>9}',
+                   'Set|Act:{target:>4|.0f}{degree:1}{actual:>6|.2f}{mark:1}{unit:1} {trend:1}{rate}',
+                   '?Add Hop in: {hop}')),
+        ((20, 4), ('{step}{heater:1}', '{kettle}{remaining:>9}',
+                   'Set|Act:{target:>3|.0f}{degree:1}{actual:>5|.1f}{mark:1}{unit}{trend:1}', '?Add Hop in: {hop}')),
+        ((16, 4), ('{step}{heater:1}', '{kettle}{remaining:>9}',
+                   'S|A:{target:>3|.0f}{degree:1}{actual:>5|.1f}{mark:1}{unit}{trend:1}', '?Hop in: {hop}')),
+        ((16, 2), ('{kettle}{remaining:>9}{heater:1}', '{actual:>5|.1f}{mark:1}{trend:1}{hop:>9}')),
+    ),
+    'hop_alert': (
+        ((20, 4), ('{stars}', '{title:^}', '{detail:^}', '{stars}')),
+        ((16, 2), ('{title:^}', '{detail:^}')),
+    ),
+    'fermenter': (
+        ((20, 4), ('{brew}{state:1}', '{fermenter}{day:>10}',
+                   'Set|Act:{target:>4|.1f}{degree:1}{actual:>5|.1f}{mark:1}{unit}',
+                   '?{down:1}{low:>4|.1f} {up:1}{high:>4|.1f} avg{avg:>4|.1f}')),
+        ((16, 4), ('{brew}{state:1}', '{fermenter}{day:>9}',
+                   'S|A:{target:>4|.1f}{degree:1}{actual:>5|.1f}{mark:1}{unit}',
+                   '?{down:1}{low:>4|.1f}{up:1}{high:>4|.1f} A{avg:>4|.1f}')),
+        ((16, 2), ('{fermenter}{day:>9}{state:1}', '{actual:>5|.1f}{mark:1}>{target:>4|.1f}{degree:1}{unit}')),
+    ),
+    # one row of the Overview mode per kettle, rendered with rows=1
+    'overview_row': (
+        ((40, 1), ('{kettle}{actual:>7|.2f}{mark:1}{unit:1}{trend:1} > {target:>6|.2f}{degree:1}{unit:1} {heater:1}',)),
+        ((20, 1), ('{kettle}{actual:>5|.1f}{mark:1}>{target:>3|.0f}{degree:1}{heater:1}',)),
+        ((16, 1), ('{kettle}{actual:>5|.1f}{mark:1}>{target:>3|.0f}{heater:1}',)),
+    ),
+    'sensor': (
+        ((20, 4), ('CBPi4 LCD Sensormode', '{rule}', '{name}', '{value}')),
+        ((16, 4), ('LCD Sensormode', '{rule}', '{name}', '{value}')),
+        ((16, 2), ('{name}', '{value}')),
+    ),
+}
+LAYOUTS = {}
+RULE = '-' * 40  # the separator row, cut to the width of the LCD
+STARS = '*' * 40
+
+# geometries which can be selected, 40x4 LCDs have two controllers and only work with backends which drive both
+GEOMETRIES = ('16x2', '16x4', '20x2', '20x4', '40x2', '40x4')
+
+
+def get_layout(screen, rows, cols):
+    # compiled once per screen and geometry
+    layout = LAYOUTS.get((screen, rows, cols))
+    if layout is None:
+        variants = SCREENS[screen]
+        fitting = [variant for variant in variants if variant[0][0] <= cols and variant[0][1] <= rows]
+        size, template = max(fitting, key=lambda variant: (variant[0][1], variant[0][0])) if fitting \
+            else min(variants, key=lambda variant: (variant[0][1], variant[0][0]))
+        layout = LAYOUTS[(screen, rows, cols)] = Layout(template, rows=rows, cols=cols)
+    return layout
+
+
+def parse_geometry(geometry):
+    # '20x4' -> (rows, cols)
+    try:
+        cols, rows = (int(value) for value in geometry.lower().split('x'))
+    except (AttributeError, ValueError):
+        logger.warning('LCDisplay - invalid geometry %s, using 20x4' % geometry)
+        cols, rows = 20, 4
+    return rows, cols
+
+
+class LCDSettings:
+    # All LCD parameters in one place. load() registers missing parameters with their defaults once at startup,
+    # the render path only reads the attributes. CBPi does not tell plugins about changed parameters, so refresh()
+    # reads them again every RELOAD_INTERVAL seconds or after invalidate() and tells the listeners which attributes
+    # changed.
+    RELOAD_INTERVAL = 5
+
+    GEOMETRY_OPTIONS = [{"label": geometry, "value": geometry} for geometry in GEOMETRIES]
+    REFRESH_OPTIONS = [{"label": "%ss" % sec, "value": sec} for sec in range(1, 7)]
+    MODE_OPTIONS = [{"label": "Multidisplay", "value": 'Multidisplay'},
+                    {"label": "Singledisplay", "value": 'Singledisplay'},
+                    {"label": "Sensordisplay", "value": 'Sensordisplay'},
+                    {"label": "Overview", "value": 'Overview'},
+                    {"label": "Fermenterdisplay", "value": 'Fermenterdisplay'}]
+
+    # attribute, parameter, default, type, description, options, conversion
+    PARAMETERS = (
+        ('address', 'LCD_Address', '0x27', ConfigType.STRING,
+         'LCD address like 0x27 or 0x3f, CBPi reboot required', None, str),
+        ('bus', 'LCD_Bus', 1, ConfigType.NUMBER,
+         'I2C bus of the LCD, 1 (0 for the very first Raspis), CBPi reboot required', None, int),
+        ('geometry', 'LCD_Geometry', '20x4', ConfigType.SELECT,
+         'Columns x rows of the LCD, CBPi reboot required', GEOMETRY_OPTIONS, str),
+        ('number_of_displays', 'LCD_Number_Of_Displays', 1, ConfigType.SELECT,
+         'Number of LCDs, every further LCD gets its own LCD_n_xxx parameters, CBPi reboot required',
+         [{"label": str(number), "value": number} for number in range(1, 5)], int),
+        ('charmap', 'LCD_Charactermap', 'A00', ConfigType.SELECT,
+         'LCD Charactermap like A00, A02, CBPi reboot required',
+         [{"label": "A00", "value": "A00"}, {"label": "A02", "value": "A02"}], str),
+        ('backend', 'LCD_Backend', 'PCF8574', ConfigType.SELECT,
+         'I2C port expander of the LCD, Virtual and None for testing without LCD, CBPi reboot required',
+         [{"label": backend, "value": backend} for backend in BACKENDS], str),
+        ('refresh_time', 'LCD_Refresh', 3, ConfigType.SELECT,
+         'Time to remain till next display in sec, NO! CBPi reboot required', REFRESH_OPTIONS, float),
+        ('display_mode', 'LCD_Display_Mode', 'Multidisplay', ConfigType.SELECT,
+         'select the mode of the LCD Display, consult readme, NO! CBPi reboot required', MODE_OPTIONS, str),
+        ('single_kettle_id', 'LCD_Singledisplay_Kettle', '', ConfigType.KETTLE,
+         'select the kettle to be displayed in LCD, consult readme, NO! CBPi reboot required', None, str),
+        ('update_mode', 'LCD_Update_Mode', 'Polling', ConfigType.SELECT,
+         'Polling repaints on a fixed time, Event repaints when a displayed value changes, NO! CBPi reboot required',
+         [{"label": "Polling", "value": 'Polling'}, {"label": "Event", "value": 'Event'}], str),
+        ('max_framerate', 'LCD_Max_Framerate', 2, ConfigType.SELECT,
+         'Maximum repaints per second in all modes, NO! CBPi reboot required',
+         [{"label": "1/s", "value": 1}, {"label": "2/s", "value": 2}, {"label": "4/s", "value": 4}], float),
+        ('sensors_per_page', 'LCD_Sensors_Per_Page', 1, ConfigType.SELECT,
+         'Number of sensors shown at once in Sensordisplay, NO! CBPi reboot required',
+         [{"label": "1", "value": 1}, {"label": "3", "value": 3}, {"label": "4", "value": 4}], int),
+        ('sensor_name_length', 'LCD_Sensor_Name_Length', 10, ConfigType.SELECT,
+         'Max. letters of a sensor name if more than one sensor is shown in Sensordisplay, NO! CBPi reboot required',
+         [{"label": "6", "value": 6}, {"label": "8", "value": 8}, {"label": "10", "value": 10},
+          {"label": "12", "value": 12}], int),
+        ('hop_alert', 'LCD_Hop_Alert', 'Screen', ConfigType.SELECT,
+         'Show an Add Hop screen at the time of a hop addition, optionally with flashing backlight, '
+         'NO! CBPi reboot required',
+         [{"label": "Off", "value": 'Off'}, {"label": "Screen", "value": 'Screen'},
+          {"label": "Screen and backlight", "value": 'Screen and backlight'}], str),
+        ('kettle_order', 'LCD_Multidisplay_Order', 'Weighted', ConfigType.SELECT,
+         'Multidisplay: Weighted shows busy kettles more often and skips idle ones, Fixed shows all kettles in turn, '
+         'NO! CBPi reboot required',
+         [{"label": "Weighted", "value": 'Weighted'}, {"label": "Fixed", "value": 'Fixed'}], str),
+        ('live_values', 'LCD_Live_Values', 'On', ConfigType.SELECT,
+         'Multidisplay: update timer, temperature and heater of the shown kettle every second, '
+         'NO! CBPi reboot required',
+         [{"label": "On", "value": 'On'}, {"label": "Off", "value": 'Off'}], str),
+        ('idle_time', 'LCD_Idle_Time', 0, ConfigType.SELECT,
+         'Switch off the backlight after this time without active step, kettle or actor changes, '
+         'NO! CBPi reboot required',
+         [{"label": "Off", "value": 0}, {"label": "10 min", "value": 10}, {"label": "30 min", "value": 30},
+          {"label": "1 h", "value": 60}, {"label": "4 h", "value": 240}], float),
+        ('idle_mode', 'LCD_Idle_Mode', 'Dim', ConfigType.SELECT,
+         'Idle LCDs: Dim shows the standby screen once a minute, Off does not write to the LCD at all, '
+         'NO! CBPi reboot required',
+         [{"label": "Dim", "value": 'Dim'}, {"label": "Off", "value": 'Off'}], str),
+        ('wake_gpio', 'LCD_Wake_GPIO', '', ConfigType.STRING,
+         'GPIO (BCM number) of a push button to ground which wakes up idle LCDs, empty if there is none, '
+         'CBPi reboot required', None, str),
+        ('warm_start', 'LCD_Warm_Start', 'On', ConfigType.SELECT,
+         'Show the last frame at once after a restart, saved every 2 min to lcdisplay_cache.json in the config '
+         'folder, NO! CBPi reboot required',
+         [{"label": "On", "value": 'On'}, {"label": "Off", "value": 'Off'}], str),
+        ('metrics', 'LCD_Metrics', 'Off', ConfigType.SELECT,
+         'Timing counters of the display loop at /lcdisplay/metrics, NO! CBPi reboot required',
+         [{"label": "Off", "value": 'Off'}, {"label": "On", "value": 'On'}], str),
+        ('heartbeat', 'LCD_Heartbeat', 30, ConfigType.SELECT,
+         'Repaint at least every x sec in Event update mode even if nothing changed, NO! CBPi reboot required',
+         [{"label": "10s", "value": 10}, {"label": "30s", "value": 30}, {"label": "60s", "value": 60}], float),
+    )
+    if SENSORTYPE_SELECT:
+        # use this if you are not using avollkopfs version of cbpi4-ui
+        PARAMETERS += (
+            ('sensortype_setting', 'LCD_Display_Sensortype', 'OneWire', ConfigType.SELECT,
+             'select the type of sensors to be displayed in LCD, consult readme, NO! CBPi reboot required',
+             [{"label": "OneWire", "value": 'OneWire'},
+              {"label": "iSpindle", "value": 'iSpindle'},
+              {"label": "MQTTSensor", "value": 'MQTTSensor'},
+              {"label": "eManometer", "value": 'eManometer'},
+              {"label": "phSensorADS1x15", "value": 'phSensorADS1x15'},
+              {"label": "HTTPSensor", "value": 'HTTPSensor'},
+              {"label": "CustomSensor", "value": 'CustomSensor'},
+              {"label": "HX711 Load Cell", "value": 'HX711 Load Cell'}], str),
+        )
+    else:
+        # this is the desired mode but requires avollkopfs craftbeerpi4-ui
+        PARAMETERS += (
+            ('sensortype_setting', 'LCD_Display_Sensortype', 'OneWire', ConfigType.SENSOR,
+             'ONLY use with this fork: https://github.com/avollkopf/craftbeerpi4, select a sensor which is '
+             'representing the sensortype you want to monitor in LCD, consult readme, NO! CBPi reboot required',
+             None, str),
+        )
+
+    # the same for LCD 2, 3 ...: the number is appended to the attribute and put into parameter and description
+    DISPLAY_PARAMETERS = (
+        ('address', 'LCD_%d_Address', '0x27', ConfigType.STRING,
+         'Address of LCD %d like 0x26, CBPi reboot required', None, str),
+        ('bus', 'LCD_%d_Bus', 1, ConfigType.NUMBER,
+         'I2C bus of LCD %d, CBPi reboot required', None, int),
+        ('geometry', 'LCD_%d_Geometry', '20x4', ConfigType.SELECT,
+         'Columns x rows of LCD %d, CBPi reboot required', GEOMETRY_OPTIONS, str),
+        ('display_mode', 'LCD_%d_Display_Mode', 'Singledisplay', ConfigType.SELECT,
+         'select the mode of LCD %d, consult readme, NO! CBPi reboot required', MODE_OPTIONS, str),
+        ('single_kettle_id', 'LCD_%d_Singledisplay_Kettle', '', ConfigType.KETTLE,
+         'select the kettle to be displayed in LCD %d, NO! CBPi reboot required', None, str),
+        ('refresh_time', 'LCD_%d_Refresh', 3, ConfigType.SELECT,
+         'Time to remain till next display in sec on LCD %d, NO! CBPi reboot required', REFRESH_OPTIONS, float),
+    )
+
+    # attribute, CBPi parameter, value if the parameter is missing
+    CBPI_PARAMETERS = (
+        ('unit', 'TEMP_UNIT', 'na'),
+        ('breweryname', 'BREWERY_NAME', 'no name'),
+        ('mash_tun', 'MASH_TUN', None),
+    )
+
+    def __init__(self, cbpi):
+        self.cbpi = cbpi
+        self.listeners = []
+        self.sensortype = None
+        self._loaded_at = 0
+        self._valid = False
+        self.parameters = self.PARAMETERS
+        for attribute, name, default, config_type, description, options, convert in self.PARAMETERS:
+            setattr(self, attribute, convert(default))
+        for attribute, name, default in self.CBPI_PARAMETERS:
+            setattr(self, attribute, default)
+
+    def add_listener(self, callback):
+        # callback(changed) is called with the set of changed attribute names
+        self.listeners.append(callback)
+
+    def invalidate(self):
+        self._valid = False
+
+    @classmethod
+    def display_parameters(cls, count):
+        parameters = ()
+        for number in range(2, count + 1):
+            for attribute, name, default, config_type, description, options, convert in cls.DISPLAY_PARAMETERS:
+                parameters += (('%s_%d' % (attribute, number), name % number, default, config_type,
+                                description % number, options, convert),)
+        return parameters
+
+    def display(self, attribute, number=1):
+        # value of a per LCD parameter, LCD 1 uses the parameters without number
+        return getattr(self, attribute if number == 1 else '%s_%d' % (attribute, number))
+
+    async def load(self):
+        await self.add_parameters(self.PARAMETERS)
+        self.read()
+        # LCD_Number_Of_Displays is known now, add the parameters of the further LCDs
+        extra = self.display_parameters(self.number_of_displays)
+        for attribute, name, default, config_type, description, options, convert in extra:
+            setattr(self, attribute, convert(default))
+        self.parameters = self.PARAMETERS + extra
+        await self.add_parameters(extra)
+        self.read()
+        for attribute, name, default, config_type, description, options, convert in self.parameters:
+            logger.info('LCDisplay - %s: %s' % (name, getattr(self, attribute)))
+        logger.info('LCDisplay - LCD unit: °%s' % self.unit)
+        logger.info('LCDisplay - LCD sensortype: %s' % self.sensortype)
+
+    def values(self):
+        # the resolved parameters, saved by WarmStart
+        values = {parameter[0]: getattr(self, parameter[0]) for parameter in self.parameters}
+        for attribute, name, default in self.CBPI_PARAMETERS:
+            values[attribute] = getattr(self, attribute)
+        values['sensortype'] = self.sensortype
+        return values
+
+    def restore(self, values):
+        # the parameters of the last run saved by WarmStart, the LCDs are opened with them before load() reads the
+        # config. load() overwrites all of them except the sensortype if LCD_Display_Sensortype did not change.
+        for attribute, name, default, config_type, description, options, convert in self.PARAMETERS:
+            try:
+                setattr(self, attribute, convert(values.get(attribute, default)))
+            except (TypeError, ValueError):
+                setattr(self, attribute, convert(default))
+        extra = self.display_parameters(self.number_of_displays)
+        for attribute, name, default, config_type, description, options, convert in extra:
+            try:
+                setattr(self, attribute, convert(values.get(attribute, default)))
+            except (TypeError, ValueError):
+                setattr(self, attribute, convert(default))
+        self.parameters = self.PARAMETERS + extra
+        for attribute, name, default in self.CBPI_PARAMETERS:
+            setattr(self, attribute, values.get(attribute, default))
+        self.sensortype = values.get('sensortype')
+
+    def hardware(self):
+        # the parameters which are only used when the LCDs are opened
+        return (self.backend, self.charmap, self.number_of_displays) + tuple(
+            self.display(attribute, number) for number in range(1, self.number_of_displays + 1)
+            for attribute in ('address', 'bus', 'geometry'))
+
+    async def add_parameters(self, parameters):
+        for attribute, name, default, config_type, description, options, convert in parameters:
+            if self.cbpi.config.get(name, None) is None:
+                try:
+                    if options is None:
+                        await self.cbpi.config.add(name, default, config_type, description)
+                    else:
+                        await self.cbpi.config.add(name, default, config_type, description, options)
+                    logger.info("%s added" % name)
+                except Exception as e:
+                    logger.warning('Unable to update config')
+                    logger.warning(e)
+                pass
+            pass
+
+    async def refresh(self):
+        if self._valid and time.monotonic() - self._loaded_at < self.RELOAD_INTERVAL:
+            return set()
+        changed = self.read()
+        if changed:
+            for callback in self.listeners:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.warning(e)
+        return changed
+
+    def read(self):
+        changed = set()
+        for attribute, name, default, config_type, description, options, convert in self.parameters:
+            value = self.cbpi.config.get(name, None)
+            try:
+                value = convert(value) if value is not None else convert(default)
+            except (TypeError, ValueError):
+                logger.warning('LCDisplay - invalid value %s for %s, using %s' % (value, name, default))
+                value = convert(default)
+            if getattr(self, attribute) != value:
+                setattr(self, attribute, value)
+                changed.add(attribute)
+        for attribute, name, default in self.CBPI_PARAMETERS:
+            try:
+                value = self.cbpi.config.get(name, default)
+            except Exception as e:
+                logger.warning('no %s found' % name)
+                logger.warning(e)
+                value = default
+            if getattr(self, attribute) != value:
+                setattr(self, attribute, value)
+                changed.add(attribute)
+        if 'sensortype_setting' in changed or self.sensortype is None:
+            sensortype = self.resolve_sensortype(self.sensortype_setting)
+            if sensortype != self.sensortype:
+                self.sensortype = sensortype
+                changed.add('sensortype')
+        self._loaded_at = time.monotonic()
+        self._valid = True
+        return changed
+
+    def resolve_sensortype(self, setting):
+        # LCD_Display_Sensortype holds a sensor id (avollkopfs ui) or directly the name of a sensor type
+        if setting is None or setting == '':
+            return None
+        try:
+            sensor = self.cbpi.sensor.find_by_id(setting)
+        except Exception as e:
+            if DEBUG: logger.info('LCDisplay - sensor lookup failed: {}'.format(e))
+            sensor = None
+        if sensor is not None:
+            return sensor.type
+        return setting
+
+
+def format_value(value):
+    # short representation of a sensor value, floats with 2 decimals at most
+    if isinstance(value, float):
+        return ("%.2f" % value).rstrip('0').rstrip('.')
+    return str(value)
+
+
+def sensor_row(name, value, name_length, cols=20):
+    # one "name: value" row, the name is cut to name_length and the value right aligned
+    value = format_value(value)
+    name = name[:max(min(name_length, cols - 2 - len(value)), 0)]
+    return ("%s:%s" % (name, value.rjust(cols - len(name) - 1)))[:cols]
+
+
+def abbreviate(name, width):
+    # shortens a name to width letters: first the inner vowels of the words are left out ('Kettle 2' -> 'Kttl 2'),
+    # then the longest word is cut letter by letter. Words with digits, mostly the number of the vessel, are kept as
+    # they are because they tell similar names apart ('Kessel 0 Läuter' -> 'Ks 0 Ltr', not 'Kssl Ltr' for both).
+    if len(name) <= width:
+        return name
+    words = name.split()
+    cuttable = [i for i, word in enumerate(words) if not any(letter.isdigit() for letter in word)]
+    for i in cuttable:
+        words[i] = words[i][:1] + ''.join(letter for letter in words[i][1:] if letter.lower() not in 'aeiouäöü')
+        if len(' '.join(words)) <= width:
+            return ' '.join(words)
+    while len(' '.join(words)) > width:
+        longest = max(cuttable, key=lambda i: len(words[i]), default=None)
+        if longest is None or len(words[longest]) < 2:
+            break
+        words[longest] = words[longest][:-1]
+    text = ' '.join(words)
+    # still too long: the end of the name is kept, that is where the number usually is
+    return text[max(len(text) - width, 0):].lstrip()
+
+
+class NetworkInfo:
+    # IP address for the standby screen. All interfaces except loopback are asked in the order wlan, ethernet,
+    # others, with one socket which is kept open. The result is cached for TTL seconds and refreshed in an executor
+    # thread, so the standby screen does no syscalls at all in between.
+    TTL = 60
+    SIOCGIFADDR = 0x8915
+
+    def __init__(self):
+        self.ip = 'Not connected'
+        self.interface = None
+        self._checked_at = None
+        self._refresh = None
+        self._socket = None
+
+    @staticmethod
+    def interface_order(name):
+        if name.startswith('wl'):
+            return 0
+        if name.startswith('eth') or name.startswith('en'):
+            return 1
+        return 2
+
+    def interfaces(self):
+        try:
+            names = [name for index, name in socket.if_nameindex() if name != 'lo']
+        except OSError as e:
+            if DEBUG: logger.info('LCDisplay - no network interfaces found: {}'.format(e))
+            names = ['wlan0', 'eth0']
+        return sorted(names, key=self.interface_order)
+
+    def address_of(self, interface):
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            return socket.inet_ntoa(fcntl.ioctl(self._socket.fileno(), self.SIOCGIFADDR,
+                                                struct.pack('256s', interface.encode()[:15]))[20:24])
+        except OSError:
+            return None
+
+    def refresh(self):
+        ip = 'Not connected'
+        found = None
+        for interface in self.interfaces():
+            address = self.address_of(interface)
+            if address is not None:
+                ip = address
+                found = interface
+                break
+        if ip != self.ip:
+            logger.info('LCDisplay - IP address %s (%s)' % (ip, found))
+        self.ip = ip
+        self.interface = found
+        self._checked_at = time.monotonic()
+        return ip
+
+    async def get_ip(self):
+        if self._checked_at is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.refresh)
+        elif time.monotonic() - self._checked_at > self.TTL and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.get_running_loop().run_in_executor(None, self.refresh)
+        return self.ip
+
+
+class Charmap:
+    # Converts names into letters the LCD can show. The str.translate table is built once per charactermap and the
+    # results are memoized, as kettle, step and sensor names rarely change. Letters which are neither in the ROM nor
+    # in the table are replaced by their base letter if the ROM has got it (é -> e), otherwise RPLCD shows a space.
+    MEMO_SIZE = 256
+
+    def __init__(self, name):
+        self.name = name
+        self.rom = ROM_TABLES.get(name)
+        table = {}
+        for char, replacement in TRANSLITERATION.items():
+            if self.rom is None or char not in self.rom:
+                table[char] = replacement
+        table.update(CHARMAP_TRANSLATIONS.get(name, {}))
+        self.table = str.maketrans(table)
+        self.degree = '°'.translate(self.table)
+        self._memo = {}
+
+    def decode(self, text):
+        if text is None:
+            return ''
+        result = self._memo.get(text)
+        if result is None:
+            result = text.translate(self.table)
+            if self.rom is not None and not all(char in self.rom or char in GLYPHS for char in result):
+                result = ''.join(self.fallback(char) for char in result)
+            if len(self._memo) >= self.MEMO_SIZE:
+                self._memo.clear()
+            self._memo[text] = result
+        return result
+
+    def fallback(self, char):
+        if char in self.rom or char in GLYPHS:
+            return char
+        base = unicodedata.normalize('NFKD', char)[:1]
+        if base in self.rom:
+            return base
+        return char
+
+
+CHARMAPS = {}
+
+
+def get_charmap(name):
+    charmap = CHARMAPS.get(name)
+    if charmap is None:
+        charmap = CHARMAPS[name] = Charmap(name)
+    return charmap
+
+
+class PageScheduler:
+    # Rotates through the pages of a paged display mode. The list of pages is handed over on every call, so added
+    # or removed kettles and sensors show up in the next cycle without restarting the rotation.
+    def __init__(self):
+        self.index = 0
+        self.cycles = 0
+
+    def next(self, pages):
+        if not pages:
+            self.index = 0
+            return None
+        if self.index >= len(pages):
+            self.index = 0
+            self.cycles += 1
+        page = pages[self.index]
+        self.index += 1
+        return page
+
+
+class KettleScheduler:
+    # Picks the kettle pages of Multidisplay by weight (smooth weighted round robin). A kettle used by the active
+    # step, with the heater on or far away from its target temperature gets more of the pages, an idle kettle
+    # (no target temperature, heater off, not used by the active step) gets none as long as another one is busy.
+    # The pages are spread evenly, a kettle with weight 6 next to one with weight 1 is not shown 6 times in a row.
+    STEP_WEIGHT = 3
+    HEATER_WEIGHT = 2
+    GAP_WEIGHT = 1
+    GAP = 2.0  # degrees between target and current temperature which count as far away
+
+    def __init__(self):
+        self.current = {}  # kettle id -> current weight of the round robin
+
+    @classmethod
+    def weight(cls, kettle, step_kettle_id, heater_on, actual):
+        try:
+            target = float(kettle.get('target_temp') or 0)
+        except (TypeError, ValueError):
+            target = 0
+        busy = kettle['id'] == step_kettle_id
+        if not busy and not heater_on and target <= 0:
+            return 0
+        weight = 1
+        if busy:
+            weight += cls.STEP_WEIGHT
+        if heater_on:
+            weight += cls.HEATER_WEIGHT
+        if target > 0 and isinstance(actual, (int, float)) and abs(target - actual) > cls.GAP:
+            weight += cls.GAP_WEIGHT
+        return weight
+
+    def next(self, weights):
+        # weights: {kettle id: weight} -> kettle id, None if there is no kettle
+        if not weights:
+            self.current.clear()
+            return None
+        total = sum(weights.values())
+        if total <= 0:
+            # everything is idle, show all kettles in turn
+            weights = dict.fromkeys(weights, 1)
+            total = len(weights)
+        for kettle_id in list(self.current):
+            if kettle_id not in weights:
+                del self.current[kettle_id]
+        best = None
+        for kettle_id, weight in weights.items():
+            self.current[kettle_id] = self.current.get(kettle_id, 0) + weight
+            if best is None or self.current[kettle_id] > self.current[best]:
+                best = kettle_id
+        self.current[best] -= total
+        return best
+
+
+class BoilTimeline:
+    # Hop additions of the active boil step. The hops are read once when the step becomes active (any number of
+    # Hop_n props, minutes before the end of the boil) and the end of the boil is only moved when the remaining time
+    # reported by CBPi differs by more than DRIFT seconds (timer paused or changed). The next addition is
+    # scheduled with call_later, so on_alert is called at the right second and not with the next frame.
+    HOP_PROP = re.compile(r'^Hop_(\d+)$')
+    REMAINING = re.compile(r'(\d+):(\d\d):(\d\d)')
+    DRIFT = 1.5  # sec
+    SAME_TIME = 1.0  # sec, hops which are due within this time are announced together
+    LATE = 10.0  # sec, a hop which was due this short time before the timer was seen running is still announced
+
+    def __init__(self, on_alert):
+        self.on_alert = on_alert
+        self.step = None  # the step dict of the last update, a new one comes from the StateIndex after changes
+        self.step_key = None
+        self.hops = []  # (seconds before the end, hop number), first addition first
+        self.done = set()  # hop numbers already announced or skipped
+        self.due = set()  # hop numbers which were due when the timeline was anchored, announced at once
+        self.end_at = None  # time.monotonic() at the end of the boil, None if the timer is not running
+        self.handle = None
+
+    def update(self, step):
+        if step is self.step:
+            return
+        self.step = step
+        if step is None or 'boil' not in str(step.get('name', '')).lower():
+            self.clear()
+            return
+        props = step.get('props') or {}
+        key = (step.get('id'), repr(sorted((name, value) for name, value in props.items()
+                                           if self.HOP_PROP.match(name))))
+        if key != self.step_key:
+            self.step_key = key
+            self.hops = self.parse_hops(props)
+            self.done = set()
+            self.due = set()
+            self.end_at = None
+            if DEBUG: logger.info('LCDisplay - boil timeline: %s' % self.hops)
+        remaining = self.parse_remaining(step.get('state_text'))
+        if remaining is None:
+            if self.end_at is not None:
+                self.end_at = None
+                self.cancel()
+            return
+        end_at = time.monotonic() + remaining
+        if self.end_at is None or abs(end_at - self.end_at) > self.DRIFT:
+            self.end_at = end_at
+            self.anchor(remaining)
+            self.schedule()
+        pass
+
+    def anchor(self, left):
+        # The end of the boil was set or moved. A hop at the start of the boil (e.g. Hop_1 = 60 on a 60 min boil) or
+        # one which got due shortly before the timer was seen running is announced at once, hops which are due for
+        # longer than LATE seconds (plugin restarted during the boil, timer changed) are skipped.
+        self.due = set()
+        for seconds, number in self.hops:
+            if number in self.done or left - seconds > 0:
+                continue
+            if left - seconds >= -self.LATE:
+                self.due.add(number)
+            else:
+                self.done.add(number)
+        pass
+
+    @classmethod
+    def parse_hops(cls, props):
+        hops = []
+        for name, value in props.items():
+            match = cls.HOP_PROP.match(name)
+            if match is None:
+                continue
+            try:
+                hops.append((float(value) * 60, int(match.group(1))))
+            except (TypeError, ValueError):
+                pass
+        hops.sort(reverse=True)
+        return hops
+
+    @classmethod
+    def parse_remaining(cls, state_text):
+        match = cls.REMAINING.search(state_text or '')
+        if match is None:
+            return None
+        hours, minutes, seconds = (int(value) for value in match.groups())
+        return hours * 3600 + minutes * 60 + seconds
+
+    def remaining(self):
+        # seconds till the end of the boil or None
+        if self.end_at is None:
+            return None
+        return max(self.end_at - time.monotonic(), 0)
+
+    def next_hop(self):
+        # (seconds till the next addition, hop number) or None
+        left = self.remaining()
+        if left is None:
+            return None
+        if self.due:
+            return 0, min(self.due)
+        for seconds, number in self.hops:
+            if number not in self.done and left - seconds > 0:
+                return left - seconds, number
+        return None
+
+    def schedule(self):
+        self.cancel()
+        next_hop = self.next_hop()
+        if next_hop is not None:
+            self.handle = asyncio.get_running_loop().call_later(next_hop[0], self.fire)
+
+    def fire(self):
+        self.handle = None
+        left = self.remaining()
+        if left is None:
+            return
+        numbers = sorted(number for seconds, number in self.hops if number not in self.done and
+                         (number in self.due or -self.SAME_TIME <= left - seconds <= self.SAME_TIME))
+        self.due = set()
+        self.done.update(numbers)
+        if numbers:
+            try:
+                self.on_alert(numbers)
+            except Exception as e:
+                logger.warning('LCDisplay - hop alert failed: {}'.format(e))
+        self.schedule()
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def clear(self):
+        self.cancel()
+        self.step_key = None
+        self.hops = []
+        self.done = set()
+        self.due = set()
+        self.end_at = None
+
+
+class StateIndex:
+    # Id indexed view of the CBPi controllers. get_state() serializes the whole collection, so it is called at most
+    # once per controller and frame: the result is kept for MAX_AGE seconds or until invalidate() is called because
+    # the controller pushed an update. Lookups by id are dictionary lookups after that.
+    MAX_AGE = 0.5
+
+    # ws topic pushed by the controller -> cached part which is outdated by it
+    UPDATE_TOPICS = {'kettleupdate': 'kettles',
+                     'actorupdate': 'actors',
+                     'sensorupdate': ('sensors', 'sensor_instances'),
+                     'step_update': 'steps',
+                     'mash_profile_update': 'steps',
+                     'fermenterupdate': ('fermenters', 'fermenter_sensors'),
+                     'fermenterstepupdate': 'fermenters'}
+
+    def __init__(self, cbpi):
+        self.cbpi = cbpi
+        self._cache = {}
+        self.passes = 0  # number of controller passes, good to see the effect of the cache
+
+    def invalidate(self, part=None):
+        if part is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(part, None)
+
+    def notify(self, topic):
+        parts = self.UPDATE_TOPICS.get(topic)
+        if parts is not None:
+            for part in (parts if isinstance(parts, tuple) else (parts,)):
+                self.invalidate(part)
+
+    def _get(self, part, build):
+        now = time.monotonic()
+        entry = self._cache.get(part)
+        if entry is None or now - entry[0] > self.MAX_AGE:
+            self.passes += 1
+            entry = (now, build())
+            self._cache[part] = entry
+        return entry[1]
+
+    def _build_kettles(self):
+        return {kettle['id']: kettle for kettle in self.cbpi.kettle.get_state()['data']}
+
+    def _build_sensors(self):
+        sensors = {}
+        by_type = {}
+        for sensor in self.cbpi.sensor.get_state()['data']:
+            sensors[sensor['id']] = sensor
+            by_type.setdefault(sensor['type'], []).append(sensor)
+        return sensors, by_type
+
+    def _build_actors(self):
+        return {actor.id: actor for actor in self.cbpi.actor.data}
+
+    def _build_sensor_instances(self):
+        return {sensor.id: sensor.instance for sensor in self.cbpi.sensor.data}
+
+    def _build_steps(self):
+        for step in self.cbpi.step.get_state()['steps']:
+            if step['status'] == 'A':
+                return step
+        return None
+
+    def _build_fermenters(self):
+        # to_dict() of every fermenter, get_state() would list all fermenter and step types too
+        try:
+            return {fermenter.id: fermenter.to_dict() for fermenter in self.cbpi.fermenter.data}
+        except AttributeError:
+            return {}  # CBPi without fermenters
+
+    def _build_fermenter_sensors(self):
+        sensors = {}
+        for fermenter in getattr(getattr(self.cbpi, 'fermenter', None), 'data', []):
+            sensors.setdefault(fermenter.sensor, []).append(fermenter.id)
+        return sensors
+
+    def kettles(self):
+        return self._get('kettles', self._build_kettles)
+
+    def fermenters(self):
+        return self._get('fermenters', self._build_fermenters)
+
+    def fermenters_of_sensor(self, sensor_id):
+        return self._get('fermenter_sensors', self._build_fermenter_sensors).get(sensor_id, ())
+
+    @staticmethod
+    def fermenter_step(fermenter):
+        # the active step of a fermenter dict or None
+        for step in fermenter.get('steps') or []:
+            if step.get('status') == 'A':
+                return step
+        return None
+
+    def kettle(self, kettle_id):
+        return self.kettles().get(kettle_id)
+
+    def sensors(self):
+        return self._get('sensors', self._build_sensors)[0]
+
+    def sensor(self, sensor_id):
+        return self.sensors().get(sensor_id)
+
+    def sensors_of_type(self, sensortype):
+        return self._get('sensors', self._build_sensors)[1].get(sensortype, [])
+
+    def actor(self, actor_id):
+        return self._get('actors', self._build_actors).get(actor_id)
+
+    def actor_state(self, actor_id):
+        try:
+            return self.actor(actor_id).instance.state
+        except Exception:
+            return False
+
+    def active_step(self):
+        return self._get('steps', self._build_steps)
+
+    def sensor_instance(self, sensor_id):
+        return self._get('sensor_instances', self._build_sensor_instances).get(sensor_id)
+
+    def sensor_value(self, sensor_id, instance=None):
+        # instance can be looked up before, then this is safe to run in an executor thread
+        if instance is None:
+            instance = self.sensor_instance(sensor_id)
+        try:
+            return instance.get_state().get('value')
+        except Exception as e:
+            if DEBUG: logger.info('LCDisplay - failed to read sensor value {} {}'.format(sensor_id, e))
+            return None
+
+
+class SensorHistory:
+    # The readings of one sensor: the last value and a ring buffer of SIZE samples, at most one every
+    # SAMPLE_INTERVAL seconds, for the trend. Times and values are kept in two arrays of doubles, so a sensor costs
+    # less than 1 kB whatever the number of readings.
+    __slots__ = ('times', 'samples', 'pos', 'count', 'value', 'read_at', 'failed')
+    SIZE = 32
+    SAMPLE_INTERVAL = 2.0  # sec, so the buffer covers about a minute
+
+    def __init__(self):
+        self.times = array('d', [0.0]) * self.SIZE
+        self.samples = array('d', [0.0]) * self.SIZE
+        self.pos = 0
+        self.count = 0
+        self.value = None  # last value read successfully
+        self.read_at = None  # time.monotonic() of this value
+        self.failed = False  # True if the last read gave no value
+
+    def add(self, value, now):
+        self.value = value
+        self.read_at = now
+        self.failed = False
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return
+        last = (self.pos - 1) % self.SIZE
+        if self.count and now - self.times[last] < self.SAMPLE_INTERVAL:
+            return
+        self.times[self.pos] = now
+        self.samples[self.pos] = value
+        self.pos = (self.pos + 1) % self.SIZE
+        self.count = min(self.count + 1, self.SIZE)
+
+    def trend(self, now, window=60.0):
+        # change per minute over the last window seconds (least squares), None if there are not enough samples
+        n = 0
+        sum_t = sum_v = sum_tt = sum_tv = 0.0
+        for i in range(self.count):
+            index = (self.pos - 1 - i) % self.SIZE
+            t = self.times[index] - now
+            if t < -window:
+                break
+            v = self.samples[index]
+            n += 1
+            sum_t += t
+            sum_v += v
+            sum_tt += t * t
+            sum_tv += t * v
+        if n < 3:
+            return None
+        variance = n * sum_tt - sum_t * sum_t
+        if variance < 1e-9 or now - self.times[(self.pos - n) % self.SIZE] < window / 4:
+            return None
+        return (n * sum_tv - sum_t * sum_v) / variance * 60
+
+
+class DayStats:
+    # Minimum, maximum and average of the last 24 hours, e.g. of a fermenter over weeks. The day is split in
+    # BUCKETS buckets of BUCKET_TIME seconds, each keeps min, max, sum and count of its values in arrays, so the
+    # memory never grows. add() only touches the current bucket, the finished buckets are summed up once when a new
+    # bucket starts and summary() combines that with the current one. So the cost per value and per frame stays the
+    # same however long the fermentation runs.
+    __slots__ = ('mins', 'maxs', 'sums', 'counts', 'bucket', 'closed')
+    BUCKETS = 96
+    BUCKET_TIME = 900  # sec, 96 x 15 min = 24 h
+
+    def __init__(self):
+        self.mins = array('d', [0.0]) * self.BUCKETS
+        self.maxs = array('d', [0.0]) * self.BUCKETS
+        self.sums = array('d', [0.0]) * self.BUCKETS
+        self.counts = array('L', [0]) * self.BUCKETS
+        self.bucket = None  # number of the current bucket since the start of time.monotonic()
+        self.closed = None  # (oldest bucket, min, max, sum, count) of the other buckets of the last 24 hours
+
+    def add(self, value, now):
+        bucket = int(now // self.BUCKET_TIME)
+        if bucket != self.bucket:
+            first = bucket - self.BUCKETS + 1 if self.bucket is None else max(self.bucket + 1,
+                                                                              bucket - self.BUCKETS + 1)
+            for number in range(first, bucket + 1):
+                index = number % self.BUCKETS
+                self.counts[index] = 0
+                self.sums[index] = 0.0
+            self.bucket = bucket
+            self.closed = None
+        index = bucket % self.BUCKETS
+        if self.counts[index] == 0:
+            self.mins[index] = self.maxs[index] = value
+        elif value < self.mins[index]:
+            self.mins[index] = value
+        elif value > self.maxs[index]:
+            self.maxs[index] = value
+        self.sums[index] += value
+        self.counts[index] += 1
+
+    def summary(self, now):
+        # -> (min, max, average) of the 24 hours before now or None without values. Only add() clears buckets, so
+        # the buckets older than 24 h are skipped here, otherwise a sensor which stops sending would freeze the values.
+        if self.bucket is None:
+            return None
+        oldest = max(int(now // self.BUCKET_TIME), self.bucket) - self.BUCKETS + 1
+        if oldest > self.bucket:
+            return None
+        current = self.bucket % self.BUCKETS
+        if self.closed is None or self.closed[0] != oldest:
+            low, high, total, count = float('inf'), float('-inf'), 0.0, 0
+            for number in range(oldest, self.bucket):
+                index = number % self.BUCKETS
+                if self.counts[index] == 0:
+                    continue
+                low = min(low, self.mins[index])
+                high = max(high, self.maxs[index])
+                total += self.sums[index]
+                count += self.counts[index]
+            self.closed = (oldest, low, high, total, count)
+        oldest, low, high, total, count = self.closed
+        if self.counts[current]:
+            low = min(low, self.mins[current])
+            high = max(high, self.maxs[current])
+            total += self.sums[current]
+            count += self.counts[current]
+        if count == 0:
+            return None
+        return low, high, total / count
+
+
+class SensorReader:
+    # Reads the sensor values of a frame at the same time in executor threads, with a deadline. Sensor plugins
+    # do their own I/O, and one which blocks in get_state() (http, mqtt round trip, slow hardware) would stop the
+    # whole display. Now it only delays its own value: after DEADLINE seconds the frame is drawn with the last known
+    # value of this sensor, marked as stale. A read which is still running is not started again, so a hanging sensor
+    # occupies at most one thread. When a late read comes back on_late(sensor_id) is called, so Event mode repaints.
+    # A read which fails also gives the last known value, marked as stale, for KEEP seconds.
+    DEADLINE = 0.25  # sec
+    KEEP = 600  # sec
+    DIGITS = 2  # decimals shown at most, a change below is no change for the display
+    TREND_MIN = 0.1  # per minute, a smaller trend gets no arrow
+
+    def __init__(self, state, on_late=None):
+        self.state = state
+        self.on_late = on_late
+        self.history = {}  # sensor id -> SensorHistory
+        self.running = {}  # sensor id -> future of the read in progress
+        self.late = set()  # sensor ids whose read missed the deadline and is still running
+        self.late_reads = 0
+
+    async def read(self, sensor_ids):
+        # -> {sensor id: value}, the value is the last known one for the ids in self.late
+        loop = asyncio.get_running_loop()
+        futures = []
+        for sensor_id in sensor_ids:
+            future = self.running.get(sensor_id)
+            if future is None:
+                future = loop.run_in_executor(None, self.state.sensor_value, sensor_id,
+                                              self.state.sensor_instance(sensor_id))
+                future.add_done_callback(lambda future, sensor_id=sensor_id: self.done(sensor_id, future))
+                self.running[sensor_id] = future
+            futures.append(future)
+        if futures:
+            await asyncio.wait(futures, timeout=self.DEADLINE)
+            for sensor_id in sensor_ids:
+                if sensor_id in self.running and sensor_id not in self.late:
+                    self.late.add(sensor_id)
+                    self.late_reads += 1
+                    if DEBUG: logger.info('LCDisplay - sensor %s missed the deadline' % sensor_id)
+        return {sensor_id: self.value(sensor_id) for sensor_id in sensor_ids}
+
+    async def read_one(self, sensor_id):
+        return (await self.read((sensor_id,)))[sensor_id]
+
+    def done(self, sensor_id, future):
+        self.running.pop(sensor_id, None)
+        if not future.cancelled():
+            self.store(sensor_id, future.result())  # sensor_value() catches the errors of the plugin
+        if sensor_id in self.late:
+            self.late.discard(sensor_id)
+            if self.on_late is not None:
+                self.on_late(sensor_id)
+
+    def store(self, sensor_id, value):
+        # -> True if the value changed in the shown decimals
+        history = self.history.get(sensor_id)
+        if history is None:
+            history = self.history[sensor_id] = SensorHistory()
+        if value is None:
+            changed = not history.failed
+            history.failed = True
+            return changed
+        last = history.value
+        history.add(value, time.monotonic())
+        if isinstance(value, float) and isinstance(last, float):
+            return round(value, self.DIGITS) != round(last, self.DIGITS)
+        return value != last
+
+    def value(self, sensor_id):
+        history = self.history.get(sensor_id)
+        if history is None or history.read_at is None:
+            return None  # never read successfully, e.g. a kettle without sensor
+        if history.failed and time.monotonic() - history.read_at > self.KEEP:
+            return None
+        return history.value
+
+    def is_stale(self, sensor_id):
+        history = self.history.get(sensor_id)
+        if sensor_id in self.late:
+            return True
+        return history is not None and history.failed and self.value(sensor_id) is not None
+
+    def trend(self, sensor_id):
+        # -> (arrow, change per minute), (' ', None) without a trend
+        history = self.history.get(sensor_id)
+        rate = history.trend(time.monotonic()) if history is not None else None
+        if rate is None:
+            return ' ', None
+        if rate >= self.TREND_MIN:
+            return ARROW_UP, rate
+        if rate <= -self.TREND_MIN:
+            return ARROW_DOWN, rate
+        return ' ', rate
+
+
+class PowerManager:
+    # Idle handling of the LCDs. activity() is called while a brew or fermenter step is active, for kettle, actor,
+    # step and fermenter changes and when the wake up button is pressed. After LCD_Idle_Time minutes without
+    # activity the LCDs switch off the backlight and show the standby screen once a minute (Dim) or are not written
+    # at all (Off) until the next activity.
+    def __init__(self):
+        self.last_activity = time.monotonic()
+        self.button = None
+
+    def activity(self):
+        self.last_activity = time.monotonic()
+
+    def is_idle(self, idle_time):
+        # idle_time in minutes, 0 switches idle handling off
+        return idle_time > 0 and time.monotonic() - self.last_activity > idle_time * 60
+
+    def setup_button(self, pin, callback):
+        # a push button between the GPIO (BCM numbering) and ground, callback(channel) runs in a thread of RPi.GPIO
+        if GPIO is None:
+            logger.warning('LCDisplay - RPi.GPIO is not installed, LCD_Wake_GPIO %s is ignored' % pin)
+            return
+        try:
+            GPIO.setmode(GPIO.BCM)
+            GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            GPIO.add_event_detect(pin, GPIO.FALLING, callback=callback, bouncetime=300)
+            self.button = pin
+            logger.info('LCDisplay - wake up button on GPIO %s' % pin)
+        except Exception as e:
+            logger.warning('LCDisplay - unable to use GPIO %s for the wake up button: %s' % (pin, e))
+
+
+class WarmStart:
+    # The LCDs show the last frame of the previous run right after a restart instead of the standby screen until
+    # CBPi has loaded its kettles, steps and sensors. save() writes the resolved parameters and the last frame and
+    # CGRAM table of every LCD to FILE in the config folder, but only if something changed and at most every
+    # SAVE_INTERVAL seconds, SD cards do not like many writes. load() reads it again at the next start.
+    FILE = 'lcdisplay_cache.json'
+    VERSION = 1
+    SAVE_INTERVAL = 120  # sec
+    RESTORE_TIMEOUT = 60  # sec the frame of the last run is kept at most while CBPi shows no active step
+
+    def __init__(self, cbpi):
+        try:
+            self.path = cbpi.config_folder.get_file_path(self.FILE)
+        except Exception as e:
+            if DEBUG: logger.info('LCDisplay - no config folder: {}'.format(e))
+            self.path = os.path.join(os.path.dirname(__file__), self.FILE)
+        self.saved = None
+
+    def load(self):
+        # blocking, runs in an executor
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning('LCDisplay - unable to read %s: %s' % (self.path, e))
+            return None
+        if not isinstance(cache, dict) or cache.get('version') != self.VERSION:
+            return None
+        self.saved = cache
+        return cache
+
+    def save(self, cache):
+        # blocking, runs in an executor. The temporary file is renamed, a power cut never leaves half a file.
+        if cache == self.saved:
+            return False
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning('LCDisplay - unable to write %s: %s' % (self.path, e))
+            return False
+        self.saved = cache
+        if DEBUG: logger.info('LCDisplay - warm start cache saved')
+        return True
+
+    def remove(self):
+        # blocking, LCD_Warm_Start was switched off
+        self.saved = None
+        try:
+            os.remove(self.path)
+            logger.info('LCDisplay - %s removed' % self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning('LCDisplay - unable to remove %s: %s' % (self.path, e))
+
+
+class LCDMetrics:
+    # Timing counters of the render path, switched on with LCD_Metrics. When switched off every hook returns after
+    # testing self.enabled, so the display loop pays nothing measurable.
+    # A frame is split in two stages: gather (reading kettles, steps and sensors) and format (building the lines).
+    # The I2C flush is measured by the DisplayWorker, its stats are part of snapshot(). The LCDs render at the same
+    # time and await sensor reads between the stages, so the start of the current stage is kept per LCDPanel.
+    LOOP_CHECK_INTERVAL = 0.25  # sec between two checks of the event loop
+    LOOP_BLOCK_THRESHOLD = 0.05  # sec, a check which wakes up later than this counts as blocked event loop
+    STAGES = ('gather', 'format')
+
+    def __init__(self):
+        self.enabled = False
+        self.workers = []
+        self.settings = None
+        self.reset()
+
+    def attach(self, workers, settings):
+        self.workers = workers
+        self.settings = settings
+
+    def reset(self):
+        self.started = time.monotonic()
+        self.stages = {stage: [0, 0.0, 0.0] for stage in self.STAGES}  # count, total, max in sec
+        self.frames = 0
+        self.last_frame_at = None
+        self.frame_interval = 0.0  # moving average in sec
+        self.loop_checks = 0
+        self.loop_blocked = 0
+        self.loop_block_time = 0.0
+        self.max_loop_block = 0.0
+
+    def begin(self, panel):
+        if self.enabled:
+            panel.metrics_mark = time.perf_counter()
+
+    def lap(self, panel, stage):
+        # adds the time since begin() or the last lap() of this panel to stage
+        if not self.enabled or panel.metrics_mark is None:
+            return
+        now = time.perf_counter()
+        elapsed = now - panel.metrics_mark
+        panel.metrics_mark = now
+        entry = self.stages[stage]
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+
+    def frame(self, panel):
+        if not self.enabled:
+            return
+        self.lap(panel, 'format')
+        panel.metrics_mark = None
+        now = time.monotonic()
+        if self.last_frame_at is not None:
+            interval = now - self.last_frame_at
+            self.frame_interval = interval if self.frames < 2 else 0.9 * self.frame_interval + 0.1 * interval
+        self.last_frame_at = now
+        self.frames += 1
+
+    async def watch_loop(self):
+        # sleeps LOOP_CHECK_INTERVAL again and again, a late wakeup means something blocked the event loop
+        loop = asyncio.get_running_loop()
+        while self.enabled:
+            expected = loop.time() + self.LOOP_CHECK_INTERVAL
+            await asyncio.sleep(self.LOOP_CHECK_INTERVAL)
+            lag = loop.time() - expected
+            self.loop_checks += 1
+            if lag > self.LOOP_BLOCK_THRESHOLD:
+                self.loop_blocked += 1
+                self.loop_block_time += lag
+                if lag > self.max_loop_block:
+                    self.max_loop_block = lag
+            pass
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        data = {'enabled': self.enabled,
+                'uptime_s': round(elapsed, 1),
+                'frames': self.frames,
+                'achieved_fps': round(self.frames / elapsed, 3) if elapsed > 0 else 0.0,
+                'frame_interval_s': round(self.frame_interval, 3),
+                'loop_checks': self.loop_checks,
+                'loop_blocked': self.loop_blocked,
+                'loop_block_ms': round(self.loop_block_time * 1000, 1),
+                'max_loop_block_ms': round(self.max_loop_block * 1000, 1)}
+        for stage, (count, total, maximum) in self.stages.items():
+            data['%s_avg_ms' % stage] = round(total * 1000 / count, 3) if count else 0.0
+            data['%s_max_ms' % stage] = round(maximum * 1000, 3)
+        if self.settings is not None:
+            data['configured_refresh_s'] = self.settings.refresh_time
+            data['configured_max_framerate'] = self.settings.max_framerate
+        if self.workers:
+            # LCD 1 at top level, all LCDs in displays if there is more than one
+            stats = self.workers[0].stats()
+            if len(self.workers) > 1:
+                data['displays'] = [worker.stats() for worker in self.workers]
+            data.update(stats)
+            data['i2c_errors'] = stats['write_errors']
+            data['i2c_retries'] = stats['write_retries']
+            data['flush_avg_ms'] = stats['avg_write_ms']
+            data['flush_max_ms'] = stats['max_write_ms']
+        return data
+
+
+METRICS = LCDMetrics()  # one per process, also read by the LCDisplay Metric sensors
+
+
+class LCDPanel:
+    # One LCD with its own frame buffer, writer thread, mode, kettle and refresh time (LCD_n_xxx parameters).
+    # All panels render from the one StateIndex of the plugin, so the controllers are read once per frame no matter
+    # how many LCDs are connected.
+    def __init__(self, number, backend, rows=4, cols=20, connected=True):
+        self.number = number
+        self.rows = rows
+        self.cols = cols
+        self.backend = backend
+        self.frame = FrameBuffer(rows=rows, cols=cols)  # the screens render into this one
+        self.worker = DisplayWorker(backend, rows=rows, cols=cols, connected=connected)
+        self.changed = asyncio.Event()  # set when something shown on this panel changed
+        self.urgent = asyncio.Event()  # set when the panel has to stop waiting at once, e.g. for a hop alert
+        self.watched_sensors = set()  # sensor ids shown in the current frame, their updates wake up the panel
+        self.sensor_pages = PageScheduler()
+        self.kettle_pages = KettleScheduler()
+        self.overview_pages = PageScheduler()
+        self.last_submitted = None
+        self.metrics_mark = None  # time.perf_counter() at the start of the current stage, see LCDMetrics
+        self.restoring = None  # time.monotonic() until the frame of the last run is kept, see WarmStart
+        self.restored = None  # the frame of the last run incl. hourglass, never saved again
+        self.blink = BLINK
+        self.backlight = True
+
+    async def sleep(self, seconds):
+        # like asyncio.sleep but returns early when something urgent has to be shown
+        if self.urgent.is_set():
+            return
+        try:
+            await asyncio.wait_for(self.urgent.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def render(self, screen, values):
+        self.frame.set_lines(get_layout(screen, self.rows, self.cols).render(values))
 
 
 class LCDisplay(CBPiExtension):
+    HOP_ALERT_TIME = 30  # sec the Add Hop screen is shown
+    IDLE_REFRESH = 60  # sec between the frames of an idle LCD
+    LIVE_INTERVAL = 1.0  # sec between the updates of the timers on a Multidisplay page
+    FLASH_INTERVAL = 0.5  # sec, backlight on/off during the hop alert
+
     def __init__(self, cbpi):
         self.cbpi = cbpi
+        self.panels = []
+        self.settings = LCDSettings(cbpi)
+        self.settings.add_listener(self.on_settings_changed)
+        self.state = StateIndex(cbpi)
+        self.sensors = SensorReader(self.state, on_late=self.on_late_sensor)
+        self.boil = BoilTimeline(self.on_hop_alert)
+        self.power = PowerManager()
+        self.fermenter_stats = {}  # fermenter id -> DayStats of its temperature
+        self.hop_alert = None  # (hop numbers, time.monotonic() when the alert ends)
+        self.network = NetworkInfo()
+        self.metrics = METRICS
+        self.metrics_task = None
+        self.warm = WarmStart(cbpi)
+        self.warm_task = None
+        self.cbpi.register(self, "/lcdisplay", static=os.path.join(os.path.dirname(__file__), "static"))
+        self.install_update_hook()
         self._task = asyncio.create_task(self.run())
 
     async def run(self):
         logger.info('LCDisplay - Info: Starting background task')
+        await self.start_display()
 
-        address = int(await self.set_lcd_address(), 16)
-        logger.info('LCDisplay - LCD address: %s' % await self.set_lcd_address())
+        # *********************************************************************************************************
+        # every LCD runs its own main loop, they share the settings and the StateIndex
+        await asyncio.gather(*[self.run_panel(panel) for panel in self.panels])
+        # *********************************************************************************************************
 
-        charmap = await self.set_lcd_charmap()
-        logger.info('LCDisplay - LCD charmap: %s' % charmap)
+    async def run_panel(self, panel):
+        while True:
+            # this is the main code repeated constantly
+            started = time.monotonic()
+            try:
+                await self.tick(panel)
+            except Exception as e:
+                logger.error('LCDisplay - LCD %s: %s' % (panel.number, e))
+            # whatever happened in the display functions the loop never runs faster than LCD_Max_Framerate
+            rest = 1.0 / self.settings.max_framerate - (time.monotonic() - started)
+            await asyncio.sleep(rest if rest > 0 else 0)
+        pass
 
-        global lcd
+    async def start_display(self):
+        loop = asyncio.get_running_loop()
+        cache = await loop.run_in_executor(None, self.warm.load)
+        if cache is not None:
+            # open the LCDs with the parameters of the last run and show its last frame, then read the config
+            self.settings.restore(cache.get('settings') or {})
+            await self.open_panels()
+            self.restore_frames(cache)
+            hardware = self.settings.hardware()
+            await self.settings.load()
+            if self.settings.hardware() != hardware:
+                logger.info('LCDisplay - LCD parameters changed since the last run, LCDs are opened again')
+                await self.close_panels()
+                await self.open_panels()
+                self.restore_frames(cache)
+        else:
+            await self.settings.load()
+            await self.open_panels()
+        self.metrics.attach([panel.worker for panel in self.panels], self.settings)
+        if self.settings.wake_gpio.strip():
+            loop = asyncio.get_running_loop()
+            try:
+                pin = int(self.settings.wake_gpio)
+            except ValueError:
+                logger.warning('LCDisplay - invalid LCD_Wake_GPIO %s' % self.settings.wake_gpio)
+            else:
+                self.power.setup_button(pin, lambda channel: loop.call_soon_threadsafe(self.wake_up))
+        self.apply_metrics_setting()
+        self.warm_task = asyncio.create_task(self.warm_start_loop())
+
+    async def open_panels(self):
+        self.charmap = self.settings.charmap  # the LCDs are initialised with it, changes need a reboot
+        for number in range(1, self.settings.number_of_displays + 1):
+            panel = await self.open_panel(number)
+            panel.worker.start()
+            self.panels.append(panel)
+
+    async def close_panels(self):
+        loop = asyncio.get_running_loop()
+        for panel in self.panels:
+            panel.worker.stop()
+            await loop.run_in_executor(None, panel.worker.join, 2.0)
+            try:
+                await loop.run_in_executor(None, panel.backend.close)
+            except Exception as e:
+                logger.warning('LCDisplay - LCD %s: %s' % (panel.number, e))
+        self.panels = []
+
+    def restore_frames(self, cache):
+        # the last frame of the previous run with an hourglass in the last cell, kept by tick() until CBPi shows an
+        # active step. Nothing is restored if the last run showed the standby screen.
+        if not cache.get('active'):
+            return
+        displays = {display.get('number'): display for display in cache.get('displays') or []}
+        until = time.monotonic() + self.warm.RESTORE_TIMEOUT
+        for panel in self.panels:
+            display = displays.get(panel.number)
+            if display is None or (display.get('rows'), display.get('cols')) != (panel.rows, panel.cols):
+                continue
+            panel.worker.glyphs.restore(display.get('glyphs') or [])
+            lines = display.get('lines')
+            if not lines or len(lines) != panel.rows or any(len(line) != panel.cols for line in lines):
+                continue
+            lines = list(lines)
+            lines[-1] = lines[-1][:-1] + STALE
+            panel.frame.set_lines(lines)
+            panel.restoring = until
+            panel.restored = lines
+            self.show_frame(panel)
+            logger.info('LCDisplay - LCD %s shows the last frame of the previous run' % panel.number)
+        pass
+
+    def warm_start_cache(self):
+        # the lines of the screens only while something is brewing, the standby screen is not worth a write
+        active = self.state.active_step() is not None or bool(self.active_fermenters())
+        displays = [{'number': panel.number,
+                     'rows': panel.rows,
+                     'cols': panel.cols,
+                     'lines': panel.last_submitted if active and panel.last_submitted != panel.restored else None,
+                     'glyphs': panel.worker.glyphs.names()} for panel in self.panels]
+        return {'version': WarmStart.VERSION,
+                'active': active,
+                'settings': self.settings.values(),
+                'displays': displays}
+
+    async def warm_start_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.warm.SAVE_INTERVAL)
+            try:
+                if self.settings.warm_start == 'On':
+                    await loop.run_in_executor(None, self.warm.save, self.warm_start_cache())
+                elif self.warm.saved is not None or os.path.exists(self.warm.path):
+                    await loop.run_in_executor(None, self.warm.remove)
+            except Exception as e:
+                logger.warning('LCDisplay - warm start cache: %s' % e)
+        pass
+
+    async def open_panel(self, number):
+        address = int(self.settings.display('address', number), 16)
+        bus = self.settings.display('bus', number)
+        rows, cols = parse_geometry(self.settings.display('geometry', number))
+        if self.settings.backend not in ('Virtual', 'None') and rows * cols > RPLCDBackend.MAX_CELLS:
+            # e.g. 40x4: only the rows of the first controller can be written, the others would show garbage
+            fallback = max(RPLCDBackend.MAX_CELLS // cols, 1)
+            logger.warning('LCDisplay - LCD %s: %sx%s is not supported by the %s backend, using %sx%s' %
+                           (number, cols, rows, self.settings.backend, cols, fallback))
+            rows = fallback
+        backend = make_backend(self.settings.backend, address, self.charmap, port=bus, rows=rows, cols=cols)
+        connected = True
         try:
-            lcd = CharLCD(i2c_expander='PCF8574', address=address, port=1, cols=20, rows=4, dotsize=8, charmap=charmap,
-                          auto_linebreaks=True, backlight_enabled=True)
-            lcd.create_char(0, bierkrug)  # u"\x00"  -->beerglass symbol
-            lcd.create_char(1, cool)  # u"\x01"  -->Ice symbol
-            lcd.create_char(2, awithdots)  # u"\x02"  -->Ä
-            lcd.create_char(3, owithdots)  # u"\x03"  -->Ö
-            lcd.create_char(4, uwithdots)  # u"\x04"  -->Ü
-            lcd.create_char(5, esszett)  # u"\x05"  -->ß
+            await asyncio.get_running_loop().run_in_executor(None, backend.open)
             if DEBUG: logger.info('LCDisplay - Info: LCD object set')
         except Exception as e:
-            if DEBUG: logger.info('LCDisplay - Error: LCD object not set or wrong LCD address or LCD Module not '
-                                  'properly connected or LCD module is defect: {}'.format(e))
+            # logged once, the DisplayWorker keeps trying to open the LCD with increasing delays
+            logger.warning('LCDisplay - Error: LCD %s object not set or wrong LCD address or LCD Module not '
+                           'properly connected or LCD module is defect: %s' % (number, e))
             # self.cbpi.notify('LCDisplay:', 'LCD Address is wrong. You have to choose a different LCD Address. Key in '
             #                               'at Raspi prompt: sudo i2cdetect -y 1 or sudo i2cdetect -y 0',
             #                 NotificationType.ERROR)
+            connected = False
+        pass
+        logger.info('LCDisplay - LCD %s backend: %s %sx%s at %s on bus %s' % (number, backend.name, cols, rows,
+                                                                              hex(address), bus))
+        return LCDPanel(number, backend, rows=rows, cols=cols, connected=connected)
+
+    async def tick(self, panel):
+        # one pass of the main loop of one LCD: the screen of the selected mode incl. its sleep
+        panel.changed.clear()
+        panel.urgent.clear()
+        await self.settings.refresh()
+        step = self.state.active_step()
+        self.boil.update(step)
+        if step is not None or self.active_fermenters():
+            # a running fermentation is activity too, the fermenter page stays on
+            self.power.activity()
+        if self.hop_alert is not None:
+            if time.monotonic() < self.hop_alert[1]:
+                await self.show_hop_alert(panel)
+                return
+            self.hop_alert = None
+        if self.power.is_idle(self.settings.idle_time):
+            await self.show_idle(panel)
+            return
+        if panel.backlight is False:
+            panel.backlight = True
+            panel.worker.set_backlight(True)
+        display_mode = self.settings.display('display_mode', panel.number)
+        refresh = self.settings.display('refresh_time', panel.number)
+        charmap = self.charmap
+        active_step = await self.get_active_step_values()
+        if panel.restoring is not None:
+            # keep the frame of the last run until CBPi has loaded its steps or RESTORE_TIMEOUT is over
+            if step is None and not self.active_fermenters() and time.monotonic() < panel.restoring:
+                await panel.sleep(1)
+                return
+            panel.restoring = None
+
+        if active_step != 'no active step' and display_mode == 'Multidisplay':
+            await self.show_multidisplay(panel, refresh, charmap)
+        elif active_step != 'no active step' and display_mode == 'Singledisplay':
+            await self.show_singledisplay(panel, self.settings.display('single_kettle_id', panel.number), charmap)
+        elif active_step != 'no active step' and display_mode == 'Sensordisplay':
+            await self.show_sensordisplay(panel, self.settings.sensortype, refresh, charmap)
+        elif active_step != 'no active step' and display_mode == 'Overview':
+            await self.show_overview(panel, refresh, charmap)
+        elif display_mode == 'Fermenterdisplay' or self.active_fermenters():
+            # also instead of the standby screen while a fermenter step is running and no brew step
+            await self.show_fermenterdisplay(panel, refresh, charmap)
+        else:
+            await self.show_standby(panel)
         pass
 
-        refresh = await self.set_lcd_refresh()
-        logger.info('LCDisplay - LCD refresh: %s' % refresh)
+    def show_frame(self, panel):
+        # hands the rendered frame over to the writer thread, never blocks the event loop.
+        # An unchanged frame is not handed over at all.
+        self.metrics.frame(panel)
+        if panel.frame.lines == panel.last_submitted:
+            return
+        panel.last_submitted = list(panel.frame.lines)
+        panel.worker.submit(panel.frame.lines)
+
+    async def wait_for_refresh(self, panel, refresh_time):
+        # Polling: fixed sleep like it always was.
+        # Event: repaint as soon as a displayed value changed, but not faster than LCD_Max_Framerate and at least
+        # every LCD_Heartbeat seconds.
+        if self.settings.update_mode == 'Event':
+            await panel.sleep(1.0 / self.settings.max_framerate)
+            try:
+                await asyncio.wait_for(panel.changed.wait(), timeout=self.settings.heartbeat)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await panel.sleep(refresh_time)
+
+    def wake_panels(self):
+        for panel in self.panels:
+            panel.changed.set()
+
+    def on_hop_alert(self, numbers):
+        logger.info('LCDisplay - add hop %s' % ', '.join(str(number) for number in numbers))
+        if self.settings.hop_alert == 'Off':
+            return
+        self.hop_alert = (numbers, time.monotonic() + self.HOP_ALERT_TIME)
+        for panel in self.panels:
+            panel.urgent.set()
+            panel.changed.set()
+
+    def notify_change(self, topic, data=None):
+        self.state.notify(topic)
+        if topic == 'sensorstate':
+            if data is not None:
+                sensor_id = data.get('id')
+                self.record_fermenter_value(sensor_id, data.get('value'))
+                if data.get('value') is not None and not self.sensors.store(sensor_id, data.get('value')):
+                    return  # the display would show the same value
+                for panel in self.panels:
+                    if sensor_id in panel.watched_sensors:
+                        panel.changed.set()
+        elif topic in WAKE_TOPICS:
+            self.power.activity()
+            self.wake_panels()
+
+    def wake_up(self):
+        # the wake up button was pressed
+        self.power.activity()
+        self.wake_panels()
+
+    def on_late_sensor(self, sensor_id):
+        # a sensor which missed the deadline answered, show its value now instead of the stale one
+        for panel in self.panels:
+            if sensor_id in panel.watched_sensors:
+                panel.changed.set()
+
+    def install_update_hook(self):
+        # CBPi controllers push every kettle, actor, step, fermenter and sensor update to the websocket clients.
+        # Tap into that stream so the display learns about changes without polling.
+        try:
+            ws = self.cbpi.ws
+            send = ws.send
 
-        display_mode = await self.set_lcd_display_mode()
-        logger.info('LCDisplay - LCD display_mode: %s' % display_mode)
+            def send_and_notify(data, *args, **kwargs):
+                send(data, *args, **kwargs)
+                try:
+                    self.notify_change(data.get('topic'), data)
+                except Exception as e:
+                    if DEBUG: logger.info('LCDisplay - notify_change failed: {}'.format(e))
 
-        unit = await self.get_cbpi_temp_unit()
-        logger.info('LCDisplay - LCD unit: °%s' % unit)
+            ws.send = send_and_notify
+        except Exception as e:
+            logger.warning('LCDisplay - unable to listen to CBPi updates, Event mode falls back to heartbeat')
+            logger.warning('LCDisplay - fermenter statistics disabled, they are collected from the sensor updates')
+            logger.warning(e)
 
-        single_kettle_id = await self.set_lcd_kettle_for_single_mode()
-        logger.info('LCDisplay - LCD single_kettle_id: %s' % single_kettle_id)
+    @on_event(topic="#")
+    async def on_cbpi_event(self, topic=None, **kwargs):
+        if topic is not None and topic.split('/')[0] in WAKE_EVENT_PREFIXES:
+            if topic.startswith('config'):
+                self.settings.invalidate()
+            elif not topic.startswith('sensor'):
+                self.power.activity()
+            self.wake_panels()
+
+    def on_settings_changed(self, changed):
+        logger.info('LCDisplay - parameters changed: %s' % ', '.join(sorted(changed)))
+        if 'metrics' in changed:
+            self.apply_metrics_setting()
+        self.wake_panels()
+
+    def apply_metrics_setting(self):
+        enabled = self.settings.metrics == 'On'
+        if enabled and not self.metrics.enabled:
+            self.metrics.reset()
+            self.metrics.enabled = True
+            self.metrics_task = asyncio.create_task(self.metrics.watch_loop())
+        elif not enabled and self.metrics.enabled:
+            self.metrics.enabled = False  # watch_loop ends after its next check
+            self.metrics_task = None
+        pass
 
-        sensor_for_sensor_mode = await self.set_lcd_sensortype_for_sensor_mode()
-        logger.info('LCDisplay - LCD sensor_for_sensor_mode: %s' % sensor_for_sensor_mode)
+    def get_metrics(self):
+        return self.metrics.snapshot()
 
-        # *********************************************************************************************************
-        while True:
-            # this is the main code repeated constantly
-            display_mode = await self.set_lcd_display_mode()
-            refresh = await self.set_lcd_refresh()
-            active_step = await self.get_active_step_values()
-
-            if active_step != 'no active step' and display_mode == 'Multidisplay':
-                await self.show_multidisplay(refresh, charmap)
-            elif active_step != 'no active step' and display_mode == 'Singledisplay':
-                single_kettle_id = await self.set_lcd_kettle_for_single_mode()
-                await self.show_singledisplay(single_kettle_id, charmap)
-            elif active_step != 'no active step' and display_mode == 'Sensordisplay':
-                sensortype = await self.set_lcd_sensortype_for_sensor_mode()
-                await self.show_sensordisplay(sensortype, refresh, charmap)
-            else:
-                await self.show_standby()
-            pass
-        pass
-        # *********************************************************************************************************
+    @request_mapping(path="/metrics", method="GET", auth_required=False)
+    async def http_get_metrics(self, request):
+        return web.json_response(data=self.get_metrics())
 
-    async def show_standby(self):
+    async def show_standby(self, panel, time_format="%Y-%m-%d %H:%M:%S"):
 
-        ip = await self.set_ip()
+        self.metrics.begin(panel)
+        ip = await self.network.get_ip()
         cbpi_version = await self.get_cbpi_version()
-        breweryname = await self.get_breweryname()
-        lcd._set_cursor_mode('hide')
-        lcd.cursor_pos = (0, 0)
-        lcd.write_string(("CBPI       %s" % cbpi_version).ljust(20))
-        lcd.cursor_pos = (1, 0)
-        lcd.write_string(("%s" % breweryname).ljust(20))
-        lcd.cursor_pos = (2, 0)
-        lcd.write_string(("IP: %s" % ip).ljust(20))
-        lcd.cursor_pos = (3, 0)
-        lcd.write_string((strftime("%Y-%m-%d %H:%M:%S", time.localtime())).ljust(20))
-        await asyncio.sleep(1)
-
-    async def show_multidisplay(self, refresh_time=2.0, charmap="A00"):
-
-        kettle_json_obj = self.cbpi.kettle.get_state()
-        kettles = kettle_json_obj['data']
-        i = 0
+        breweryname = self.settings.breweryname
+        self.metrics.lap(panel, 'gather')
+        panel.render('standby', {'version': cbpi_version,
+                                 'brewery': self.cbidecode(breweryname, self.charmap),
+                                 'ip': ip,
+                                 'date_time': strftime(time_format, time.localtime())})
+        self.show_frame(panel)
+        if time_format.endswith('%S'):
+            await panel.sleep(1)
+
+    async def show_idle(self, panel):
+        # backlight off and the standby screen without seconds once a minute, or nothing at all with LCD_Idle_Mode
+        # Off. Any activity ends the wait at once.
+        if panel.backlight is True:
+            logger.info('LCDisplay - LCD %s idle' % panel.number)
+            panel.backlight = False
+            panel.worker.set_backlight(False)
+        panel.watched_sensors = set()
+        if self.settings.idle_mode == 'Dim':
+            await self.show_standby(panel, "%Y-%m-%d %H:%M")
+        try:
+            await asyncio.wait_for(panel.changed.wait(), timeout=self.IDLE_REFRESH)
+        except asyncio.TimeoutError:
+            pass
+
+    async def show_hop_alert(self, panel):
+        numbers, until = self.hop_alert
+        remaining = self.boil.remaining()
+        panel.render('hop_alert', {'stars': STARS,
+                                   'title': 'Add Hop %s' % ', '.join(str(number) for number in numbers),
+                                   'detail': ('Boil %s left' % time.strftime("%H:%M:%S", time.gmtime(remaining)))
+                                   if remaining is not None else ''})
+        self.show_frame(panel)
+        if self.settings.hop_alert == 'Screen and backlight':
+            panel.backlight = not panel.backlight
+            panel.worker.set_backlight(panel.backlight)
+        await panel.sleep(self.FLASH_INTERVAL)
+
+    async def show_multidisplay(self, panel, refresh_time=2.0, charmap="A00"):
+        # one round has as many pages as there are kettles, Weighted only changes which kettles get them
         multidisplay = True
-        while i < len(kettles):
+        kettle_ids = list(self.state.kettles())
+        if self.settings.kettle_order == 'Weighted':
+            kettle_ids = [panel.kettle_pages.next(self.kettle_weights()) for kettle_id in kettle_ids]
+        for kettle_id in kettle_ids:
             try:
-                kettle_id = kettles[i]["id"]
-                # kettle_name = (kettles[i]["name"])
-                # logger.info("multi kettle_name: {}".format(kettle_name))
-                await self.show_singledisplay(kettle_id, charmap, refresh_time, multidisplay)
+                await self.show_singledisplay(panel, kettle_id, charmap, refresh_time, multidisplay)
             except Exception as e:
                 logger.error(e)
             pass
-            i = i + 1
+            if panel.urgent.is_set():
+                break
         pass
 
-    async def show_singledisplay(self, kettle_id, charmap="A00", refresh_time=1.0, multidisplay=False):
+    async def show_overview(self, panel, refresh_time=2.0, charmap="A00"):
+        # one row per kettle: name, current and target temperature, heater. More kettles than rows are shown on
+        # pages which change every refresh_time. All values of a page come from one snapshot of the kettles and
+        # one parallel read of their sensors.
+        self.metrics.begin(panel)
+        kettles = list(self.state.kettles().values())
+        rows = panel.frame.rows
+        page = panel.overview_pages.next([kettles[i:i + rows] for i in range(0, len(kettles), rows)]) or []
+        sensor_ids = [kettle.get('sensor') for kettle in page]
+        values = await self.sensors.read([sensor_id for sensor_id in sensor_ids if sensor_id])
+        self.metrics.lap(panel, 'gather')
+        degree = get_charmap(charmap).degree
+        layout = get_layout('overview_row', 1, panel.frame.cols)
+        name_length = layout.widths.get('kettle', 0)
+        lines = []
+        for kettle, sensor_id in zip(page, sensor_ids):
+            try:
+                target_temp = float(kettle.get('target_temp'))
+            except (TypeError, ValueError):
+                target_temp = 'n.a'
+            try:
+                current_temp = float(values.get(sensor_id))
+            except (TypeError, ValueError):
+                current_temp = 'n.a'
+            lines += layout.render({'kettle': self.cbidecode(abbreviate(kettle.get('name', ''), name_length), charmap),
+                                    'actual': current_temp,
+                                    'mark': STALE if self.sensors.is_stale(sensor_id) else degree,
+                                    'trend': self.sensors.trend(sensor_id)[0],
+                                    'target': target_temp,
+                                    'degree': degree,
+                                    'unit': self.settings.unit,
+                                    'heater': BEERGLASS if self.state.actor_state(kettle.get('heater')) is True
+                                    else ' '})
+        if not kettles:
+            lines.append('no kettle defined')
+        lines += [''] * (rows - len(lines))
+        for row, line in enumerate(lines):
+            panel.frame.set_line(row, line)
+        self.show_frame(panel)
+        panel.watched_sensors = set(sensor_ids)
+        if len(kettles) > rows:
+            await panel.sleep(refresh_time)
+        else:
+            await self.wait_for_refresh(panel, refresh_time)
+
+    def active_fermenters(self):
+        return [fermenter for fermenter in self.state.fermenters().values()
+                if self.state.fermenter_step(fermenter) is not None]
+
+    def record_fermenter_value(self, sensor_id, value):
+        # every value a fermenter sensor pushes goes into the 24 h statistics, whatever the LCD shows. The values read
+        # for a frame do not, a dead probe would go on with its last known value and the average would depend on
+        # how often the page is shown.
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return
+        now = time.monotonic()
+        for fermenter_id in self.state.fermenters_of_sensor(sensor_id):
+            stats = self.fermenter_stats.get(fermenter_id)
+            if stats is None:
+                stats = self.fermenter_stats[fermenter_id] = DayStats()
+            stats.add(value, now)
+
+    @staticmethod
+    def fermenter_day(step):
+        # 'Day 3/14' of a fermenter step with a timer (TimerD, TimerH, TimerM), the status text otherwise
+        if step is None:
+            return ''
+        props = step.get('props') or {}
+        try:
+            total = (float(props.get('TimerD') or 0) * 86400 + float(props.get('TimerH') or 0) * 3600 +
+                     float(props.get('TimerM') or 0) * 60)
+        except (TypeError, ValueError):
+            total = 0
+        if total <= 0:
+            state_text = step.get('state_text') or ''
+            return 'Wait' if 'Waiting for Target Temp' in state_text else state_text
+        days = int(-(-total // 86400))
+        endtime = step.get('endtime') or 0
+        if endtime <= 0:
+            return 'Day -/%d' % days
+        elapsed = total - max(endtime - time.time(), 0)
+        return 'Day %d/%d' % (min(int(elapsed // 86400) + 1, days), days)
+
+    async def show_fermenterdisplay(self, panel, refresh_time=2.0, charmap="A00"):
+        # one page per fermenter with an active step (all fermenters if none is active): brew name, heater or
+        # cooler, day of the step, target and current temperature and min/max/avg of the last 24 hours
+        fermenters = self.active_fermenters() or list(self.state.fermenters().values())
+        if not fermenters:
+            await self.show_standby(panel)
+            return
+        degree = get_charmap(charmap).degree
+        name_length = get_layout('fermenter', panel.frame.rows, panel.frame.cols).widths.get('fermenter', 0)
+        for fermenter in fermenters:
+            self.metrics.begin(panel)
+            sensor_id = fermenter.get('sensor')
+            sensor_value = await self.sensors.read_one(sensor_id) if sensor_id else None
+            stats = self.fermenter_stats.get(fermenter['id'])
+            low, high, avg = (stats.summary(time.monotonic()) if stats is not None else None) or (None, None, None)
+            self.metrics.lap(panel, 'gather')
+            if self.state.actor_state(fermenter.get('heater')) is True:
+                state = BEERGLASS
+            elif self.state.actor_state(fermenter.get('cooler')) is True:
+                state = SNOWFLAKE
+            else:
+                state = ' '
+            try:
+                target_temp = float(fermenter.get('target_temp'))
+            except (TypeError, ValueError):
+                target_temp = 'n.a'
+            try:
+                current_temp = float(sensor_value)
+            except (TypeError, ValueError):
+                current_temp = 'n.a'
+            panel.render('fermenter', {'brew': self.cbidecode(fermenter.get('brewname') or fermenter.get('name', ''),
+                                                              charmap),
+                                       'state': state,
+                                       'fermenter': self.cbidecode(abbreviate(fermenter.get('name', ''), name_length),
+                                                                   charmap),
+                                       'day': self.fermenter_day(self.state.fermenter_step(fermenter)),
+                                       'target': target_temp,
+                                       'actual': current_temp,
+                                       'mark': STALE if self.sensors.is_stale(sensor_id) else degree,
+                                       'degree': degree,
+                                       'unit': self.settings.unit,
+                                       'down': ARROW_DOWN if low is not None else None,
+                                       'low': low,
+                                       'up': ARROW_UP if high is not None else None,
+                                       'high': high,
+                                       'avg': avg})
+            self.show_frame(panel)
+            await panel.sleep(refresh_time)
+            if panel.urgent.is_set():
+                break
+
+    def kettle_weights(self):
+        step = self.state.active_step()
+        step_kettle_id = (step.get('props') or {}).get('Kettle') if step is not None else None
+        weights = {}
+        for kettle_id, kettle in self.state.kettles().items():
+            weights[kettle_id] = KettleScheduler.weight(kettle, step_kettle_id,
+                                                        self.state.actor_state(kettle.get('heater')) is True,
+                                                        self.sensors.value(kettle.get('sensor')))
+        return weights
+
+    async def show_singledisplay(self, panel, kettle_id, charmap="A00", refresh_time=1.0, multidisplay=False):
+        self.metrics.begin(panel)
 
         # what if kettle_id ="" like a forgotten settings entry?  # todo
         # get default Kettle from Settings
-        if kettle_id is None or kettle_id is "":
-            kettle_id = self.cbpi.config.get('MASH_TUN', None)
+        if kettle_id is None or kettle_id == "":
+            kettle_id = self.settings.mash_tun
         pass
 
         steps = await self.get_active_step_values()
         step_name1 = steps['active_step_name']
-        step_name = await self.cbidecode(step_name1, charmap)
+        step_name = self.cbidecode(step_name1, charmap)
         # step_name = step_name1
         step_state = steps['active_step_state_text']
         # logger.info("step_state main: {}".format(step_state))
-        steps_props = steps['active_step_probs']
-
-        remaining_time = step_state.replace("Status: ", "")
 
         kettlevalues = await self.get_kettle_values(kettle_id)
         kettle_name1 = kettlevalues['kettle_name']
-        kettle_name = await self.cbidecode(kettle_name1, charmap)
+        kettle_name = self.cbidecode(kettle_name1, charmap)
         # kettle_name = kettle_name1
         kettle_target_temp = kettlevalues['kettle_target_temp']
         kettle_sensor_id = kettlevalues['kettle_sensor_id']
-        kettle = self.cbpi.kettle.find_by_id(kettle_id)
-        heater = self.cbpi.actor.find_by_id(kettle.heater)
-        kettle_heater_status = heater.instance.state
+        kettle_heater_status = self.state.actor_state(kettlevalues['kettle_heater_id'])
 
-        sensor_value = self.cbpi.sensor.get_sensor_value(kettle_sensor_id).get('value')
+        sensor_value = await self.sensors.read_one(kettle_sensor_id)
+        self.metrics.lap(panel, 'gather')
 
-        lcd_unit = await self.get_cbpi_temp_unit()
-
-        if "Waiting for Target Temp" in remaining_time:
-            remaining_time = "Wait"
-            is_timer_running = False
-        elif remaining_time == "":
-            is_timer_running = False
-        elif remaining_time is None:
-            is_timer_running = False
-        else:
-            is_timer_running = True
-        pass
+        lcd_unit = self.settings.unit
+        degree = get_charmap(charmap).degree
 
         boil_check = step_name.lower()
-        if ("boil" in boil_check) is True:  # string "boil" in stepname detected
-            try:
-                # convert 00:00:00 to sec
-                time_left = sum(x * int(t) for x, t in zip([3600, 60, 1], remaining_time.split(":")))
-                next_hop_alert = await self.get_next_hop_timer(steps_props, time_left)
-            except Exception as e:
-                # logger.error(e)
-                next_hop_alert = None
-            pass
-            # line1 the stepname
-            line1 = ("%s" % step_name).ljust(20)
-
-            # line2 if steptimer is running show remaining time and kettlename together
-            if is_timer_running is True:
-                line2 = (("%s %s" % (kettle_name.ljust(12)[:11], remaining_time)).ljust(20)[:20])
-                pass
-            else:
-                line2 = ('%s' % kettle_name.ljust(20)[:20])
-            pass
-
-            # step3 target temp and current temp in one line
-            try:
-                line3 = ("Set|Act:%4.0f°%5.1f%s%s" % (float(kettle_target_temp), float(sensor_value), "°", lcd_unit))[
-                        :20]
-            except Exception as e:
-                logger.error(e)
-                line3 = ("Set|Act:%4.0f°%s%s%s" % (float(kettle_target_temp), " n.a ", "°", lcd_unit))[:20]
-            pass
-
-            # line 4 if hoptimer running show it
-            if next_hop_alert is not None:
-                line4 = ("Add Hop in: %s" % next_hop_alert)[:20]
-            else:
-                line4 = "                    "[:20]
-            pass
-        else:
-            # no string "boil" in stepname detected
-            # line1 the stepname
-            line1 = ('%s' % step_name.ljust(20)[:20])
-
-            # line2 when steptimer is running show remaining time and kettlename
-            if is_timer_running is True:
-                line2 = (("%s %s" % (kettle_name.ljust(12)[:11], remaining_time)).ljust(20)[:20])
-                pass
-            else:
-                line2 = ('%s' % kettle_name.ljust(20)[:20])
-            pass
-
-            # line 3 Target temp
-            line3 = ("Targ. Temp:%6.2f%s%s" % (float(kettle_target_temp), "°", lcd_unit)).ljust(20)[:20]
+        # a boil step looks like all the other steps plus the time to the next hop addition
+        screen = 'boil' if "boil" in boil_check else 'kettle'
 
-            # line 4 Current temp
-            try:
-                line4 = ("Curr. Temp:%6.2f%s%s" % (float(sensor_value), "°", lcd_unit)).ljust(20)[:20]
-            except Exception as e:
-                logger.error(e)
-                line4 = (u"Curr. Temp: {}".format("No Data"))[:20]
-            pass
-        pass
+        try:
+            target_temp = float(kettle_target_temp)
+        except (TypeError, ValueError):
+            target_temp = 'n.a'
 
-        lcd._set_cursor_mode('hide')
-        lcd.cursor_pos = (0, 0)
-        lcd.write_string(line1.ljust(20))
-        lcd.cursor_pos = (0, 19)
-        # line 321 - 342 this is all about showing beerglass if heater of kettle is on.
+        # this is all about showing beerglass in the last cell of line1 if heater of kettle is on.
         # blinking in singlemode, constant in multimode
         # blinking in single mode indicates that the instance is still running even if temperature is not
         # changing for a while
         # logger.info("Blinking multidisplay is in status: {}".format(multidisplay))
         if multidisplay is False:
-            global BLINK
-            if BLINK is False and kettle_heater_status is True:
-                lcd.write_string("\x00")
-                BLINK = True
+            if panel.blink is False and kettle_heater_status is True:
+                heater = BEERGLASS
+                panel.blink = True
             else:
-                lcd.write_string(" ")
-                BLINK = False
-            pass
-        elif multidisplay is True:
-            if kettle_heater_status is True:
-                lcd.write_string(u"\x00")
+                heater = " "
+                panel.blink = False
             pass
         else:
-            lcd.write_string(" ")
-            logger.error("Blinking multidisplay is in status: {}".format(multidisplay))
+            heater = BEERGLASS if kettle_heater_status is True else " "
         pass
-        lcd.cursor_pos = (1, 0)
-        lcd.write_string(line2.ljust(20))
-        lcd.cursor_pos = (2, 0)
-        lcd.write_string(line3.ljust(20))
-        lcd.cursor_pos = (3, 0)
-        lcd.write_string(line4.ljust(20))
-        await asyncio.sleep(refresh_time)
 
-    async def show_sensordisplay(self, sensortype, refresh_time=1.0, charmap="A00"):
+        values = {'step': step_name,
+                  'kettle': kettle_name,
+                  'target': target_temp,
+                  'degree': degree,
+                  'unit': lcd_unit}
+        values.update(self.live_values(step_state, kettle_sensor_id, sensor_value, heater, screen == 'boil', degree))
+        panel.render(screen, values)
+        self.show_frame(panel)
+        if multidisplay is True:
+            if self.settings.live_values == 'On':
+                await self.hold_page(panel, screen, values, kettle_sensor_id, kettlevalues['kettle_heater_id'],
+                                     refresh_time)
+            else:
+                await panel.sleep(refresh_time)
+        else:
+            panel.watched_sensors = {kettle_sensor_id}
+            await self.wait_for_refresh(panel, refresh_time)
 
-        if sensortype is not None:
+    def live_values(self, step_state, sensor_id, sensor_value, heater, boil, degree):
+        # the values of a kettle page which change while the page is shown
+        remaining_time = (step_state or "").replace("Status: ", "")
+        if "Waiting for Target Temp" in remaining_time:
+            remaining_time = ""
+        pass
+        try:
+            current_temp = float(sensor_value)
+        except (TypeError, ValueError):
+            current_temp = 'n.a'
+        next_hop_alert = None
+        if boil is True:
+            next_hop = self.boil.next_hop()
+            if next_hop is not None:
+                next_hop_alert = time.strftime("%H:%M:%S", time.gmtime(next_hop[0]))
+            pass
+        pass
+        trend, rate = self.sensors.trend(sensor_id)
+        return {'remaining': remaining_time,
+                'actual': current_temp,
+                'mark': STALE if self.sensors.is_stale(sensor_id) else degree,
+                'trend': trend,
+                'rate': '%+.1f%s/min' % (rate, degree) if rate is not None else '',
+                'heater': heater,
+                'hop': next_hop_alert}
+
+    async def hold_page(self, panel, screen, values, sensor_id, heater_id, refresh_time):
+        # Multidisplay shows a kettle page for refresh_time. Meanwhile the timers, the temperature and the heater
+        # are updated every LIVE_INTERVAL seconds with the rest of the page kept as it is. The writer thread only
+        # writes the cells which differ from the last frame, usually the last digits of the timers.
+        end = time.monotonic() + refresh_time
+        while True:
+            left = end - time.monotonic()
+            if left <= self.LIVE_INTERVAL or panel.urgent.is_set():
+                await panel.sleep(left)
+                return
+            await panel.sleep(self.LIVE_INTERVAL)
+            if panel.urgent.is_set():
+                return
+            self.metrics.begin(panel)
+            step = self.state.active_step()
+            heater = BEERGLASS if self.state.actor_state(heater_id) is True else " "
+            sensor_value = await self.sensors.read_one(sensor_id)
+            values.update(self.live_values(step['state_text'] if step is not None else "", sensor_id,
+                                           sensor_value, heater, screen == 'boil', values['degree']))
+            self.metrics.lap(panel, 'gather')
+            panel.render(screen, values)
+            self.show_frame(panel)
+
+    async def show_sensordisplay(self, panel, sensortype, refresh_time=1.0, charmap="A00"):
+        # shows one page per call, the main loop comes back for the next one. Every call sleeps refresh_time,
+        # also when there is no sensor of this type at all.
+        self.metrics.begin(panel)
+        sensors = self.state.sensors_of_type(sensortype) if sensortype is not None else []
+        per_page = min(self.settings.sensors_per_page, panel.frame.rows)
+        if per_page > 1:
+            await self.show_sensorpage(panel, sensortype, sensors, per_page, charmap)
+            await panel.sleep(refresh_time)
+            return
+
+        sensor = panel.sensor_pages.next(sensors)
+        sensor_value = await self.sensors.read_one(sensor['id']) if sensor is not None else None
+        self.metrics.lap(panel, 'gather')
+        if sensor is not None:
             try:
-                sensor_json_obj = self.cbpi.sensor.get_state()
-                sensors = sensor_json_obj['data']
-                # if DEBUG: logger.info("sensors %s" % sensors)
-                i = 0
-                while i < len(sensors):
-                    if sensors[i]["type"] == sensortype:
-                        # sensortype = (sensors[i]["type"])
-                        sensor_name = (sensors[i]['name'])
-                        sensor_id = (sensors[i]['id'])
-                        sensor_value = self.cbpi.sensor.get_sensor_value(sensor_id).get('value')
-
-                        line1 = 'CBPi4 LCD Sensormode'
-                        line2 = '--------------------'
-                        # line2 = ('Type: %s' % (await self.cbidecode(sensortype, charmap))).ljust(20)[:20]
-                        line3 = ('%s' % (await self.cbidecode(sensor_name, charmap)).ljust(20)[:20])
-                        # line3 = (sensor_name.ljust(20))[:20]
-                        line4 = (str(sensor_value).ljust(20))[:20]
-
-                        lcd._set_cursor_mode('hide')
-                        lcd.cursor_pos = (0, 0)
-                        lcd.write_string(line1.ljust(20))
-                        lcd.cursor_pos = (1, 0)
-                        lcd.write_string(line2.ljust(20))
-                        lcd.cursor_pos = (2, 0)
-                        lcd.write_string(line3.ljust(20))
-                        lcd.cursor_pos = (3, 0)
-                        lcd.write_string(line4.ljust(20))
-                        await asyncio.sleep(refresh_time)
-                    i = i + 1
-                    # Todo if there is no match to sensortype of any sensor there need to be a sleep. Otherwise this is
-                    #  constantly running with no sleep at all. Blocks the website.
-                    #  Unlikely that this condition will happen
-                pass
+                name = self.cbidecode(sensor['name'], charmap)
+                value = str(sensor_value)
+                if self.sensors.is_stale(sensor['id']):
+                    value += STALE
             except Exception as e:
                 logger.info(e)
-                await asyncio.sleep(refresh_time)
+                name = 'no data'
+                value = ''
+        elif sensortype is not None:
+            name = 'no sensor of type'
+            value = sensortype
         else:
-            line1 = 'CBPi4 LCD Sensormode'
-            line2 = '--------------------'
-            line3 = 'no sensor selected  '
-            line4 = 'or defined          '
-
-            lcd._set_cursor_mode('hide')
-            lcd.cursor_pos = (0, 0)
-            lcd.write_string(line1.ljust(20))
-            lcd.cursor_pos = (1, 0)
-            lcd.write_string(line2.ljust(20))
-            lcd.cursor_pos = (2, 0)
-            lcd.write_string(line3.ljust(20))
-            lcd.cursor_pos = (3, 0)
-            lcd.write_string(line4.ljust(20))
-            await asyncio.sleep(refresh_time)
+            name = 'no sensor selected'
+            value = 'or defined'
         pass
 
-    async def get_next_hop_timer(self, active_step, time_left):
-        hop_timers = []
-        for x in range(1, 6):
-            try:
-                hop_search_string = ('Hop_' + str(x))
-                hop = active_step[hop_search_string]
-                hop = int(hop) * 60
-            except Exception as e:
-                hop = None
-            if hop is not None:
-                hop_left = time_left - hop
-                if hop_left > 0:
-                    hop_timers.append(hop_left)
-                    if DEBUG: logger.info("LCDDisplay  - get_next_hop_timer %s %s" % (x, str(hop_timers)))
-                pass
-            pass
-        pass
-
-        if len(hop_timers) != 0:
-            next_hop_timer = time.strftime("%H:%M:%S", time.gmtime(min(hop_timers)))
-        else:
-            next_hop_timer = None
-        return next_hop_timer
-        pass
+        panel.render('sensor', {'rule': RULE, 'name': name, 'value': value})
+        self.show_frame(panel)
+        await panel.sleep(refresh_time)
+
+    async def show_sensorpage(self, panel, sensortype, sensors, per_page, charmap="A00"):
+        # compact layout: one "name: value" row per sensor. With 3 sensors per page the first row shows the
+        # sensortype and the page number.
+        pages = [sensors[i:i + per_page] for i in range(0, len(sensors), per_page)]
+        page = panel.sensor_pages.next(pages)
+        values = await self.sensors.read([sensor['id'] for sensor in page]) if page is not None else {}
+        self.metrics.lap(panel, 'gather')
+        if page is None:
+            panel.render('sensor', {'rule': RULE,
+                                    'name': 'no sensor of type' if sensortype is not None else 'no sensor selected',
+                                    'value': sensortype if sensortype is not None else 'or defined'})
+            self.show_frame(panel)
+            return
+        row = 0
+        cols = panel.frame.cols
+        if per_page < panel.frame.rows:
+            title = (self.cbidecode(sensortype, charmap))[:cols - 6]
+            page_no = '%s/%s' % (panel.sensor_pages.index, len(pages))
+            panel.frame.set_line(0, '%s%s' % (title, page_no.rjust(cols - len(title))))
+            row = 1
+        for sensor in page:
+            name = self.cbidecode(sensor['name'], charmap)
+            value = format_value(values[sensor['id']])
+            if self.sensors.is_stale(sensor['id']):
+                value += STALE
+            panel.frame.set_line(row, sensor_row(name, value, self.settings.sensor_name_length, cols))
+            row += 1
+        while row < panel.frame.rows:
+            panel.frame.set_line(row, '')
+            row += 1
+        self.show_frame(panel)
 
     async def get_cbpi_version(self):
         try:
@@ -452,225 +2895,20 @@ class LCDisplay(CBPiExtension):
             version = "no vers."
         return version
 
-    async def get_cbpi_temp_unit(self):
-        try:
-            unit = self.cbpi.config.get("TEMP_UNIT", None)
-        except Exception as e:
-            logger.warning('no cbpi temp. unit found')
-            logger.warning(e)
-            unit = "na"
-        pass
-        return unit
-
-    async def set_ip(self):
-        if await self.get_ip('wlan0') != 'Not connected':
-            ip = await self.get_ip('wlan0')
-        elif await self.get_ip('eth0') != 'Not connected':
-            ip = await self.get_ip('eth0')
-        elif await self.get_ip('enxb827eb488a6e') != 'Not connected':
-            ip = await self.get_ip('enxb827eb488a6e')
-        else:
-            ip = 'Not connected'
-        pass
-        return ip
-
-    async def get_ip(self, interface):
-        ip_addr = 'Not connected'
-        so = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            ip_addr = socket.inet_ntoa(
-                fcntl.ioctl(so.fileno(), 0x8915, struct.pack('256s', bytes(interface.encode())[:15]))[20:24])
-        except Exception as e:
-            logger.warning('no ip found')
-            if DEBUG: logger.warning(e)
-            return ip_addr
-        finally:
-            pass
-        return ip_addr
-
-    async def get_breweryname(self):
-        try:
-            brewery = self.cbpi.config.get("BREWERY_NAME", None)
-        except Exception as e:
-            logger.warning('no breweryname found')
-            logger.warning(e)
-            brewery = "no name"
-        pass
-        return brewery
-
-    async def set_lcd_address(self):
-        lcd_address = self.cbpi.config.get("LCD_Address", None)
-        if lcd_address is None:
-            try:
-                await self.cbpi.config.add("LCD_Address", '0x27', ConfigType.STRING,
-                                           "LCD address like 0x27 or 0x3f, CBPi reboot required")
-                logger.info("LCD_Address added")
-                lcd_address = self.cbpi.config.get("LCD_Address", None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        return lcd_address
-
-    async def set_lcd_charmap(self):
-        lcd_charmap = self.cbpi.config.get("LCD_Charactermap", None)
-        if lcd_charmap is None:
-            logger.info("LCD_Charactermap added")
-            try:
-                await self.cbpi.config.add("LCD_Charactermap", 'A00', ConfigType.SELECT, "LCD Charactermap like A00, "
-                                                                                         "A02, CBPi reboot required",
-                                           [{"label": "A00", "value": "A00"}, {"label": "A02", "value": "A02"}])
-                lcd_charmap = self.cbpi.config.get("LCD_Charactermap", None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        return lcd_charmap
-
-    async def set_lcd_refresh(self):
-        ref = self.cbpi.config.get('LCD_Refresh', None)
-        if ref is None:
-            logger.info("LCD_Refresh added")
-            try:
-                await self.cbpi.config.add('LCD_Refresh', 3, ConfigType.SELECT,
-                                           'Time to remain till next display in sec, NO! CBPi reboot '
-                                           'required', [{"label": "1s", "value": 1}, {"label": "2s", "value": 2},
-                                                        {"label": "3s", "value": 3}, {"label": "4s", "value": 4},
-                                                        {"label": "5s", "value": 5}, {"label": "6s", "value": 6}])
-                ref = self.cbpi.config.get('LCD_Refresh', None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        return ref
-
-    async def set_lcd_display_mode(self):
-        mode = self.cbpi.config.get('LCD_Display_Mode', None)
-        if mode is None:
-            logger.info("LCD_Display_Mode added")
-            try:
-                await self.cbpi.config.add('LCD_Display_Mode', 'Multidisplay', ConfigType.SELECT,
-                                           'select the mode of the LCD Display, consult readme, NO! CBPi reboot '
-                                           'required', [{"label": "Multidisplay", "value": 'Multidisplay'},
-                                                        {"label": "Singledisplay", "value": 'Singledisplay'},
-                                                        {"label": "Sensordisplay", "value": 'Sensordisplay'}])
-                mode = self.cbpi.config.get('LCD_Display_Mode', None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        return mode
-
-    async def set_lcd_sensortype_for_sensor_mode(self):
-        # this mode is the desired mode but requires avollkopfs craftbeerpi4-ui
-        # avollkopfs repository is highly recommended to use
-        sensor_id = self.cbpi.config.get('LCD_Display_Sensortype', None)  # this is only Sensor ID not type
-        if sensor_id is None:
-            try:
-                await self.cbpi.config.add('LCD_Display_Sensortype', 'OneWire', ConfigType.SENSOR,
-                                           'ONLY use with this fork: https://github.com/avollkopf/craftbeerpi4, '
-                                           'select a sensor which is representing the sensortype you want to monitor '
-                                           'in LCD, consult readme, '
-                                           'NO! CBPi reboot required')
-                logger.info("LCD_Display_Sensortype added")
-                sensor_id = self.cbpi.config.get('LCD_Display_Sensortype', None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        if sensor_id is not None:
-            sensor_values = await self.get_sensor_values_by_id(sensor_id)
-            sensor_type = (sensor_values["sensor_type"])
-        else:
-            sensor_type = None
-        # logger.info("sensor_type {}".format(sensor_type))
-        return sensor_type
-
-    async def set_lcd_sensortype_for_sensor_mode1(self):
-        # this mode should be used if you are not using avollkopf version of cbpi4-ui
-        sensor_type = self.cbpi.config.get('LCD_Display_Sensortype', None)
-        if sensor_type is None:
-            try:
-                await self.cbpi.config.add('LCD_Display_Sensortype', 'OneWire', ConfigType.SELECT,
-                                           'select the type of sensors to be displayed in LCD, consult readme, '
-                                           'NO! CBPi reboot required',
-                                           [{"label": "OneWire", "value": 'OneWire'},
-                                            {"label": "iSpindle", "value": 'iSpindle'},
-                                            {"label": "MQTTSensor", "value": 'MQTTSensor'},
-                                            {"label": "eManometer", "value": 'eManometer'},
-                                            {"label": "phSensorADS1x15", "value": 'phSensorADS1x15'},
-                                            {"label": "HTTPSensor", "value": 'HTTPSensor'},
-                                            {"label": "CustomSensor", "value": 'CustomSensor'},
-                                            {"label": "HX711 Load Cell", "value": 'HX711 Load Cell'}])
-                logger.info("LCD_Display_Sensortype added")
-                sensor_type = self.cbpi.config.get('LCD_Display_Sensortype', None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        return sensor_type
-
-    async def set_lcd_kettle_for_single_mode(self):
-        kettle_id = self.cbpi.config.get('LCD_Singledisplay_Kettle', None)
-        if kettle_id is None:
-            try:
-                await self.cbpi.config.add('LCD_Singledisplay_Kettle', '', ConfigType.KETTLE,
-                                           'select the kettle to be displayed in LCD, consult readme, '
-                                           'NO! CBPi reboot required')
-                logger.info("LCD_Singledisplay_Kettle added")
-                kettle_id = self.cbpi.config.get('LCD_Singledisplay_Kettle', None)
-            except Exception as e:
-                logger.warning('Unable to update config')
-                logger.warning(e)
-            pass
-        pass
-        return kettle_id
-
-    async def cbidecode(self, string, charmap="A00"):  # Changes some german Letters to be displayed
-        if charmap == "A00":
-            # if DEBUG: logger.info('LCDDisplay  - string: %s' % string)
-            replaced_text = string.replace("Ä", "\x02").replace("Ö", u"\x03").replace("Ü", "\x04").replace("ß",
-                                                                                                           "\x05")
-            # if DEBUG: logger.info('LCDDisplay  - replaced_text: %s' % replaced_text)
-            return replaced_text
-        else:
-            return string
-        pass
+    def cbidecode(self, string, charmap="A00"):  # Changes some german Letters to be displayed
+        return get_charmap(charmap).decode(string)
 
     async def get_active_step_values(self):
         try:
-            step_json_obj = self.cbpi.step.get_state()
-            steps = step_json_obj['steps']
-
-            i = 0
-            result = 'no active step'
-            while i < len(steps):
-                if steps[i]["status"] == "A":
-                    active_step_name = ("Name: %s" % (steps[i]["name"]))
-                    active_step_status = ("Status: %s" % (steps[i]["status"]))
-                    active_step_state_text = ("Status: %s" % (steps[i]["state_text"]))
-                    active_step_target_temp = ("Target Temp: %s°C" % (steps[i]["props"]["Temp"]))
-                    active_step_timer_value = ("Timer: %s" % (steps[i]["props"]["Timer"]))
-                    active_step_probs = (steps[i]["props"])
-                    return {'active_step_name': active_step_name,
-                            'active_step_status': active_step_status,
-                            'active_step_state_text': active_step_state_text,
-                            'active_step_target_temp': active_step_target_temp,
-                            'active_step_timer_value': active_step_timer_value,
-                            'active_step_probs': active_step_probs}
-                else:
-                    result = 'no active step'
-                pass
-                i = i + 1
-            pass
-            return result
-
+            step = self.state.active_step()
+            if step is None:
+                return 'no active step'
+            return {'active_step_name': "Name: %s" % step["name"],
+                    'active_step_status': "Status: %s" % step["status"],
+                    'active_step_state_text': "Status: %s" % step["state_text"],
+                    'active_step_target_temp': "Target Temp: %s°C" % step["props"]["Temp"],
+                    'active_step_timer_value': "Timer: %s" % step["props"]["Timer"],
+                    'active_step_probs': step["props"]}
         except Exception as e:
             logger.warning(e)
             return {'active_step_name': 'error',
@@ -681,29 +2919,14 @@ class LCDisplay(CBPiExtension):
 
     async def get_kettle_values(self, kettle_id):
         try:
-            kettle_json_obj = self.cbpi.kettle.get_state()
-            kettles = kettle_json_obj['data']
-            # if DEBUG: logger.info("kettles %s" % kettles)
-            i = 0
-            result = None
-            while i < len(kettles):
-                if kettles[i]["id"] == kettle_id:
-                    kettle_id = (kettles[i]["id"])
-                    kettle_name = (kettles[i]["name"])
-                    kettle_heater_id = (kettles[i]["heater"])
-                    kettle_sensor_id = (kettles[i]["sensor"])
-                    kettle_target_temp = (kettles[i]["target_temp"])
-                    return {'kettle_id': kettle_id,
-                            'kettle_name': kettle_name,
-                            'kettle_heater_id': kettle_heater_id,
-                            'kettle_sensor_id': kettle_sensor_id,
-                            'kettle_target_temp': kettle_target_temp}
-                else:
-                    result = 'no kettle found with id %s' % kettle_id
-                pass
-                i = i + 1
-            pass
-            return result
+            kettle = self.state.kettle(kettle_id)
+            if kettle is None:
+                return 'no kettle found with id %s' % kettle_id
+            return {'kettle_id': kettle["id"],
+                    'kettle_name': kettle["name"],
+                    'kettle_heater_id': kettle["heater"],
+                    'kettle_sensor_id': kettle["sensor"],
+                    'kettle_target_temp': kettle["target_temp"]}
         except Exception as e:
             logger.warning(e)
             return {'kettle_id': 'error',
@@ -713,42 +2936,33 @@ class LCDisplay(CBPiExtension):
                     'kettle_target_temp': 'error'}
         pass
 
-    pass
 
-    async def get_sensor_values_by_id(self, sensor_id):
-        try:
-            sensor_json_obj = self.cbpi.sensor.get_state()
-            sensors = sensor_json_obj['data']
-            # if DEBUG: logger.info("sensors %s" % sensors)
-            i = 0
-            while i < len(sensors):
-                if sensors[i]["id"] == sensor_id:
-                    sensor_type = (sensors[i]["type"])
-                    sensor_name = (sensors[i]["name"])
-                    # sensor_id = (sensors[i]['id'])
-                    sensor_props = (sensors[i]["props"])
-                    sensor_value = self.cbpi.sensor.get_sensor_value(sensor_id).get('value')
-                    return {'sensor_id': sensor_id,
-                            'sensor_name': sensor_name,
-                            'sensor_type': sensor_type,
-                            'sensor_value': sensor_value,
-                            'sensor_props': sensor_props}
-                else:
-
-                    pass
-                pass
-                i = i + 1
-            pass
-        except Exception as e:
-            logger.info(e)
-            return {'sensor_id': 'error',
-                    'sensor_name': 'error',
-                    'sensor_type': 'error',
-                    'sensor_value': 'error',
-                    'sensor_props': 'error'}
-        pass
-        await asyncio.sleep(1)
+@parameters([Property.Select(label="Metric", options=['achieved_fps', 'frame_interval_s', 'gather_avg_ms',
+                                                      'format_avg_ms', 'flush_avg_ms', 'flush_max_ms', 'i2c_errors',
+                                                      'frames_dropped', 'max_loop_block_ms', 'loop_blocked'],
+                             description="Value of the LCDisplay metrics shown by this sensor, set LCD_Metrics to On")])
+class LCDMetricSensor(CBPiSensor):
+    # makes one of the LCDisplay metrics available like a sensor, e.g. for the dashboard or the sensor log
+    UPDATE_INTERVAL = 5
+
+    def __init__(self, cbpi, id, props):
+        super(LCDMetricSensor, self).__init__(cbpi, id, props)
+        self.metric = self.props.get("Metric", 'achieved_fps')
+        self.value = 0
+
+    async def run(self):
+        while self.running:
+            try:
+                self.value = METRICS.snapshot().get(self.metric, 0)
+            except Exception as e:
+                if DEBUG: logger.info('LCDisplay - metric sensor failed: {}'.format(e))
+            self.push_update(self.value)
+            await asyncio.sleep(self.UPDATE_INTERVAL)
+
+    def get_state(self):
+        return dict(value=self.value)
 
 
 def setup(cbpi):
     cbpi.plugin.register("LCDisplay", LCDisplay)
+    cbpi.plugin.register("LCDisplay Metric", LCDMetricSensor)
@@ -0,0 +1,45 @@
+import os
+import sys
+import asyncio
+import importlib
+
+import pytest
+
+pytest.importorskip('cbpi')
+pytest.importorskip('aiohttp')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+lcdisplay = importlib.import_module('cbpi4-LCDisplay')
+
+
+def boil_step(state_text, **hops):
+    props = {'Temp': 99, 'Timer': 60}
+    props.update(hops)
+    return {'id': 'boil', 'name': 'Boil', 'status': 'A', 'state_text': state_text, 'props': props}
+
+
+def run_timeline(step, seconds):
+    # the alerts of a BoilTimeline anchored with step within the next seconds
+    alerts = []
+
+    async def main():
+        timeline = lcdisplay.BoilTimeline(alerts.append)
+        timeline.update(step)
+        await asyncio.sleep(seconds)
+        timeline.clear()
+    asyncio.run(main())
+    return alerts
+
+
+def test_hop_at_start_of_boil_is_announced_at_once():
+    # Hop_1 = 60 on a 60 min boil is due the second the timer starts
+    assert run_timeline(boil_step('01:00:00', Hop_1=60, Hop_2=10), 0.2) == [[1]]
+
+
+def test_hop_due_shortly_before_the_timer_was_seen_is_announced():
+    assert run_timeline(boil_step('00:59:55', Hop_1=60, Hop_2=10), 0.2) == [[1]]
+
+
+def test_passed_hops_are_not_announced_after_restart():
+    # plugin restarted 3 s before the end of the boil: Hop_1 is long gone, only Hop_2 and Hop_7 are due
+    step = boil_step('00:00:03', Hop_1=60, Hop_2=0.04, Hop_7=0.04)
+    assert run_timeline(step, 1.5) == [[2, 7]]
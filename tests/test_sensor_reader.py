@@ -0,0 +1,26 @@
+import os
+import sys
+import importlib
+
+import pytest
+
+pytest.importorskip('cbpi')
+pytest.importorskip('aiohttp')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+lcdisplay = importlib.import_module('cbpi4-LCDisplay')
+
+
+def test_sensor_without_value_is_not_stale():
+    # a kettle without sensor, an unknown sensor id or {'value': None}: the first read gives None
+    reader = lcdisplay.SensorReader(state=None)
+    assert reader.store('s1', None) is True
+    assert reader.value('s1') is None
+    assert reader.is_stale('s1') is False
+
+
+def test_failed_read_keeps_the_last_value_as_stale():
+    reader = lcdisplay.SensorReader(state=None)
+    reader.store('s1', 20.5)
+    reader.store('s1', None)
+    assert reader.value('s1') == 20.5
+    assert reader.is_stale('s1') is True
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# Benchmark of the LCDisplay render pipeline without CraftBeerPi and without LCD.
+#
+# A simulated CBPi (kettles, sensors, actors, mash steps with hop props) feeds the plugin and the frames are
+# written to the Virtual backend, so the numbers are reproducible on any Linux box with cbpi4 installed.
+# Every display mode is run for a number of main loop passes (LCDisplay.tick). The sleeps of the plugin are
+# skipped and the frames are written in the same thread, so one pass measures gathering, formatting and writing.
+#
+# Run it from the root of the repository (it is not installed with the plugin):
+# python3 tools/benchmark.py
+# python3 tools/benchmark.py --kettles 8 --sensors 16 --hops 5 --passes 1000 --cold
+# python3 tools/benchmark.py --displays 4 --modes Singledisplay
+# python3 tools/benchmark.py --json > before.json
+#
+# Reported per mode:
+# passes/s        main loop passes per second, with --displays one pass renders every LCD once
+# frames/pass     frames handed to the writers per pass (Multidisplay shows every kettle in one pass)
+# p50/p95/p99     latency of one pass in ms
+# peak KiB        highest memory allocated during one pass (tracemalloc)
+# lcd B/pass      bytes (commands and characters) sent to the HD44780 per pass
+# i2c B/pass      estimated bytes on the I2C bus per pass with a PCF8574 backpack
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import importlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+lcdisplay = importlib.import_module('cbpi4-LCDisplay')
+
+MODES = ('Multidisplay', 'Overview', 'Singledisplay', 'Sensordisplay', 'Sensorpage', 'Fermenterdisplay', 'Standby',
+         'ActiveStep')
+
+
+class FakeItem:
+    # stands in for the dataclasses of cbpi.api.dataclasses (Kettle, Sensor, Actor, Step, Fermenter)
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def to_dict(self):
+        return {key: value for key, value in self.__dict__.items() if key != 'instance'}
+
+
+class FakeInstance:
+    def __init__(self, value=0.0, state=False):
+        self.value = value
+        self.state = state
+
+    def get_state(self):
+        return {'value': self.value}
+
+
+class FakeController:
+    def __init__(self, data):
+        self.data = data
+
+    def get_state(self):
+        return {'data': [item.to_dict() for item in self.data], 'types': {}}
+
+    def find_by_id(self, item_id):
+        for item in self.data:
+            if item.id == item_id:
+                return item
+        return None
+
+
+class FakeSensorController(FakeController):
+    def get_sensor_value(self, sensor_id):
+        sensor = self.find_by_id(sensor_id)
+        return sensor.instance.get_state() if sensor is not None else None
+
+
+class FakeStepController:
+    def __init__(self, steps):
+        self.profile = steps
+
+    def get_state(self):
+        return {'basic': {'name': 'Benchmark Brew'}, 'steps': [step.to_dict() for step in self.profile]}
+
+
+class FakeConfig:
+    def __init__(self, values):
+        self.values = dict(values)
+
+    def get(self, name, default=None):
+        value = self.values.get(name)
+        return default if value is None or value == '' else value
+
+    async def add(self, name, value, config_type, description, options=None, source='craftbeerpi'):
+        self.values[name] = value
+
+    async def set(self, name, value):
+        self.values[name] = value
+
+
+class FakeBus:
+    def register(self, topic, method, once=False):
+        pass
+
+
+class FakeWebSocket:
+    def send(self, data, sorting=False):
+        pass
+
+
+class FakeCBPi:
+    version = '4.x benchmark'
+
+    def __init__(self, kettles=4, sensors=8, steps=5, hops=5, fermenters=2, config=None):
+        self.config = FakeConfig({'TEMP_UNIT': 'C', 'BREWERY_NAME': 'Brauerei Müller', 'LCD_Backend': 'Virtual',
+                                  'LCD_Display_Sensortype': 'OneWire'})
+        if config:
+            self.config.values.update(config)
+        self.bus = FakeBus()
+        self.ws = FakeWebSocket()
+        sensors = max(sensors, 1)
+        self.sensor = FakeSensorController(
+            [FakeItem(id='sensor%d' % i, name='Sensor Nr. %d Würze' % i,
+                      type='OneWire' if i % 4 else 'iSpindle', props={},
+                      instance=FakeInstance(value=20.0 + i)) for i in range(sensors)])
+        self.actor = FakeController(
+            [FakeItem(id='heater%d' % i, name='Heater %d' % i, props={},
+                      instance=FakeInstance(state=i % 2 == 0)) for i in range(kettles)])
+        self.kettle = FakeController(
+            [FakeItem(id='kettle%d' % i, name='Kessel %d Läuter' % i, heater='heater%d' % i,
+                      sensor='sensor%d' % (i % sensors), agitator=None, target_temp=60 + i, props={})
+             for i in range(kettles)])
+        hop_props = {'Hop_%d' % i: 60 - i * 60 // (hops + 1) for i in range(1, hops + 1)}
+        profile = []
+        for i in range(max(steps, 1)):
+            # the last step is the active boil step, so the hop timer is part of the measurement
+            last = i == max(steps, 1) - 1
+            props = dict(hop_props, Temp=99, Timer=90) if last else {'Temp': 60 + i, 'Timer': 20}
+            profile.append(FakeItem(id='step%d' % i, name='Boil' if last else 'Rast %d' % i,
+                                    type='BoilStep' if last else 'MashStep', props=props,
+                                    status='A' if last else 'D', state_text='01:15:00' if last else ''))
+        self.step = FakeStepController(profile)
+        # fermenters with a running 14 day step, days 3, 4, ...
+        self.fermenter = FakeController(
+            [FakeItem(id='fermenter%d' % i, name='Gärtank %d' % i, brewname='Weizen %d' % i,
+                      sensor='sensor%d' % (i % sensors), heater='heater%d' % (i % max(kettles, 1)), cooler=None,
+                      target_temp=18.0 + i, props={},
+                      steps=[{'id': 'fstep%d' % i, 'name': 'Primary', 'state_text': '', 'type': 'FermenterStep',
+                              'status': 'A', 'endtime': time.time() + (11 - i) * 86400,
+                              'props': {'TimerD': 14, 'TimerH': 0, 'TimerM': 0, 'Temp': 18 + i}}])
+             for i in range(fermenters)])
+        self.config.values.setdefault('MASH_TUN', 'kettle0')
+        self.config.values.setdefault('LCD_Singledisplay_Kettle', 'kettle0')
+
+    def register(self, obj, url_prefix=None, static=None):
+        pass
+
+    def change_values(self, n):
+        # every pass a sensor moves, like during a real brew day
+        sensor = self.sensor.data[n % len(self.sensor.data)]
+        sensor.instance.value = round(sensor.instance.value + 0.1, 2)
+        self.ws.send({'topic': 'sensorstate', 'id': sensor.id, 'value': sensor.instance.value})
+
+
+class SyncWorker(lcdisplay.DisplayWorker):
+    # writes every frame at once in the calling thread, the I2C time of a real LCD is not part of the benchmark
+    def submit(self, lines):
+        self.frames_submitted += 1
+        self.write_frame(lines)
+        self.frames_written += 1
+
+
+async def skip_sleep(delay, result=None):
+    await ORIGINAL_SLEEP(0)
+    return result
+
+
+ORIGINAL_SLEEP = asyncio.sleep
+
+
+async def skip_panel_sleep(self, seconds):
+    await ORIGINAL_SLEEP(0)
+
+
+ORIGINAL_PANEL_SLEEP = lcdisplay.LCDPanel.sleep
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def make_plugin(cbpi):
+    plugin = lcdisplay.LCDisplay(cbpi)
+    plugin._task.cancel()  # the benchmark drives the passes itself
+    plugin.warm.load = lambda: None  # every mode starts without the warm start cache ...
+    await plugin.start_display()
+    plugin.warm_task.cancel()  # ... and never writes it
+    for panel in plugin.panels:
+        panel.worker.stop()
+        panel.worker = SyncWorker(panel.backend, rows=panel.frame.rows, cols=panel.frame.cols)
+    return plugin
+
+
+async def run_mode(mode, args):
+    display_mode = 'Sensordisplay' if mode == 'Sensorpage' else mode
+    config = {'LCD_Display_Mode': display_mode, 'LCD_Refresh': 0, 'LCD_Number_Of_Displays': args.displays,
+              'LCD_Geometry': args.geometry}
+    for number in range(2, args.displays + 1):
+        config.update({'LCD_%d_Display_Mode' % number: display_mode, 'LCD_%d_Refresh' % number: 0,
+                       'LCD_%d_Geometry' % number: args.geometry,
+                       'LCD_%d_Singledisplay_Kettle' % number: 'kettle%d' % ((number - 1) % max(args.kettles, 1))})
+    if mode == 'Sensorpage':
+        config['LCD_Sensors_Per_Page'] = 4
+    cbpi = FakeCBPi(kettles=args.kettles, sensors=args.sensors, steps=args.steps, hops=args.hops, config=config)
+    if mode == 'Standby':
+        cbpi.step.profile[-1].status = 'I'
+        for fermenter in cbpi.fermenter.data:
+            fermenter.steps[0]['status'] = 'D'  # otherwise the fermenters are shown instead of the standby screen
+    plugin = await make_plugin(cbpi)
+    backends = [panel.backend for panel in plugin.panels]
+    if mode == 'ActiveStep':
+        async def one_pass():
+            await plugin.get_active_step_values()
+    else:
+        async def one_pass():
+            for panel in plugin.panels:
+                await plugin.tick(panel)
+
+    for n in range(args.warmup):
+        cbpi.change_values(n)
+        await one_pass()
+    for backend in backends:
+        backend.reset_counters()
+    frames = sum(panel.worker.frames_submitted for panel in plugin.panels)
+
+    latencies = []
+    peaks = []
+    if args.memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for n in range(args.passes):
+        cbpi.change_values(n)
+        if args.cold:
+            plugin.state.invalidate()
+        if args.memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        begin = time.perf_counter()
+        await one_pass()
+        latencies.append(time.perf_counter() - begin)
+        if args.memory:
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    elapsed = time.perf_counter() - started
+    if args.memory:
+        tracemalloc.stop()
+
+    passes = args.passes
+    return {'mode': mode,
+            'passes_per_s': round(passes / elapsed, 1) if elapsed else 0.0,
+            'frames_per_pass': round((sum(panel.worker.frames_submitted for panel in plugin.panels) - frames) / passes,
+                                     2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'peak_kib': round(max(peaks) / 1024.0, 1) if peaks else None,
+            'lcd_bytes_per_pass': round(sum(backend.lcd_bytes for backend in backends) / passes, 1),
+            'i2c_bytes_per_pass': round(sum(backend.i2c_bytes for backend in backends) / passes, 1),
+            'controller_passes': plugin.state.passes}
+
+
+def print_table(results):
+    header = ('mode', 'passes/s', 'frames/pass', 'p50 ms', 'p95 ms', 'p99 ms', 'peak KiB', 'lcd B/pass',
+              'i2c B/pass')
+    keys = ('mode', 'passes_per_s', 'frames_per_pass', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_kib',
+            'lcd_bytes_per_pass', 'i2c_bytes_per_pass')
+    widths = [17] + [13] * (len(keys) - 1)
+    print(''.join(title.rjust(width) for title, width in zip(header, widths)))
+    for result in results:
+        print(''.join(str(result[key] if result[key] is not None else '-').rjust(width)
+                      for key, width in zip(keys, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the LCDisplay render pipeline')
+    parser.add_argument('--kettles', type=int, default=4)
+    parser.add_argument('--sensors', type=int, default=8)
+    parser.add_argument('--steps', type=int, default=5)
+    parser.add_argument('--hops', type=int, default=5)
+    parser.add_argument('--displays', type=int, default=1, choices=range(1, 5), help='number of LCDs')
+    parser.add_argument('--geometry', default='20x4', choices=lcdisplay.GEOMETRIES, help='columns x rows')
+    parser.add_argument('--passes', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--cold', action='store_true', help='drop the StateIndex cache before every pass')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip tracemalloc, it slows down')
+    parser.add_argument('--json', action='store_true', help='print the results as json')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.sleep = skip_sleep
+    lcdisplay.LCDPanel.sleep = skip_panel_sleep
+    try:
+        results = [asyncio.run(run_mode(mode, args)) for mode in args.modes]
+    finally:
+        asyncio.sleep = ORIGINAL_SLEEP
+        lcdisplay.LCDPanel.sleep = ORIGINAL_PANEL_SLEEP
+    if args.json:
+        print(json.dumps({'kettles': args.kettles, 'sensors': args.sensors, 'steps': args.steps, 'hops': args.hops,
+                          'displays': args.displays, 'geometry': args.geometry, 'passes': args.passes,
+                          'cold': args.cold, 'results': results},
+                         indent=2))
+    else:
+        print('kettles %s, sensors %s, steps %s, hops %s, displays %s (%s), passes %s%s' % (
+            args.kettles, args.sensors, args.steps, args.hops, args.displays, args.geometry, args.passes,
+            ', cold cache' if args.cold else ''))
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()